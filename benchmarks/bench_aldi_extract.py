@@ -0,0 +1,84 @@
+"""
+Compare the streaming ALDI link extractor with the BeautifulSoup full parse.
+
+Usage: python benchmarks/bench_aldi_extract.py [--repeat N] [--fixture PATH]
+
+Prints a JSON object with the best wall time and the peak traced memory of
+each extractor on a saved copy of the offers page.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.links import find_catalog_links, iter_catalog_links  # noqa: E402
+
+TITLE_PREFIX = 'ALDI online akciós újság'
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'aldi-online-akcios-ujsag.html')
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_file_chunks(path):
+    # Mirrors HttpClient.iter_content: the body is never held in memory at once
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def streaming(path):
+    return list(iter_catalog_links(iter_file_chunks(path), TITLE_PREFIX))
+
+
+def beautifulsoup(path):
+    # The old code path: the whole response.text, then a full parse tree
+    with open(path, 'rb') as f:
+        html = f.read().decode('utf-8')
+    return find_catalog_links(html, TITLE_PREFIX)
+
+
+def measure(func, path, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        links = func(path)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': round(best, 6), 'peak_bytes': peak, 'links': len(links)}
+
+
+def run(path=FIXTURE, repeat=5):
+    results = {
+        'fixture': os.path.basename(path),
+        'fixture_bytes': os.path.getsize(path),
+        'streaming': measure(streaming, path, repeat),
+        'beautifulsoup': measure(beautifulsoup, path, repeat),
+    }
+    if results['streaming']['links'] != results['beautifulsoup']['links']:
+        raise SystemExit('Extractors disagree on the number of links')
+    results['speedup'] = round(results['beautifulsoup']['seconds'] / results['streaming']['seconds'], 2)
+    results['memory_ratio'] = round(results['beautifulsoup']['peak_bytes'] / results['streaming']['peak_bytes'], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fixture', default=FIXTURE)
+    args = parser.parse_args()
+    print(json.dumps(run(args.fixture, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
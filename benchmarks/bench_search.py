@@ -0,0 +1,86 @@
+"""
+Offer search latency on a synthetic index.
+
+Usage: python benchmarks/bench_search.py [--offers N] [--repeat N]
+
+Builds an in-memory SearchIndex over N generated Hungarian product names
+(spread over weekly catalogs of four stores) and prints a JSON object with the
+build time, the cost of replacing one catalog, and the best query time of a
+few typical searches.
+"""
+import argparse
+from datetime import date, datetime, timedelta
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.catalog import Catalog  # noqa: E402
+from scripts.search import SearchIndex  # noqa: E402
+
+WORDS = ('teavaj', 'vajkrém', 'trappista', 'sajt', 'tejföl', 'joghurt', 'kenyér', 'csirkemell',
+         'sertés', 'karaj', 'őszibarack', 'alma', 'banán', 'paradicsom', 'paprika', 'ásványvíz',
+         'narancslé', 'kávé', 'tea', 'csokoládé', 'keksz', 'liszt', 'cukor', 'rizs', 'tészta')
+QUERIES = ('vaj', 'trappista sajt', 'oszibarack', 'csirke', 'kave')
+STORES = ('ALDI', 'LIDL', 'SPAR', 'TESCO')
+OFFERS_PER_CATALOG = 400
+
+
+def synthetic_index(offers: int):
+    rng = random.Random(0)
+    index = SearchIndex(path=os.devnull)
+    catalogs = []
+    today = date.today()
+    for i in range(max(offers // OFFERS_PER_CATALOG, 1)):
+        valid_from = datetime.combine(today - timedelta(weeks=i // len(STORES)), datetime.min.time())
+        catalog = Catalog(f'https://example.invalid/{i}', valid_from, valid_from + timedelta(days=6))
+        names = [' '.join(rng.sample(WORDS, 3)) + f' {rng.randint(1, 9) * 100} g'
+                 for _ in range(OFFERS_PER_CATALOG)]
+        catalogs.append((f'seg{i}', STORES[i % len(STORES)], catalog, names))
+    return index, catalogs
+
+
+def best(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return round(min(samples), 6)
+
+
+def run(offers=100000, repeat=20):
+    index, catalogs = synthetic_index(offers)
+    start = time.perf_counter()
+    for segment, store, catalog, names in catalogs:
+        index.update_segment(segment, store, catalog, names)
+    build = time.perf_counter() - start
+
+    segment, store, catalog, names = catalogs[0]
+    today = date.today()
+    index.search('vaj', on=today)  # Builds the sorted token list once
+    return {
+        'offers': offers,
+        'build_seconds': round(build, 6),
+        'update_catalog_seconds': best(lambda: index.update_segment(segment, store, catalog, names), 5),
+        'queries': {
+            query: {'seconds': best(lambda: index.search(query, on=today), repeat),
+                    'hits': len(index.search(query, on=today))}
+            for query in QUERIES
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--offers', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.offers, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
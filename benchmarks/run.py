@@ -0,0 +1,231 @@
+"""
+Benchmark suite for crawling, index merging and rendering.
+
+Runs everything against the local stand-in server (benchmarks.server) and
+temporary working directories, so no retailer site is contacted and the
+repository's data/ is never touched.
+
+Usage: python -m benchmarks.run [--output results.json] [--scales 100,10000,100000]
+                                [--latency 0.05] [--error-rate 0.0] [--repeat 3]
+"""
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import bench_aldi_extract, bench_search  # noqa: E402
+from benchmarks.server import host_map, host_map_env, start_server  # noqa: E402
+
+STORES = ('ALDI', 'LIDL', 'SPAR', 'TESCO')
+
+# Synthetic history: this many catalogs per store per week
+CATALOGS_PER_WEEK = 10
+
+
+@contextmanager
+def workdir():
+    """Temporary working directory laid out like the repository root."""
+    previous = os.getcwd()
+    path = tempfile.mkdtemp(prefix='akcios-bench-')
+    shutil.copy(os.path.join(REPO_ROOT, 'styles.css'), path)
+    os.makedirs(os.path.join(path, 'data'))
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def synthetic_catalogs(count: int, store: str):
+    """``count`` weekly catalogs for one store, newest first."""
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    catalogs = []
+    for i in range(count):
+        valid_from = start - timedelta(weeks=i // CATALOGS_PER_WEEK)
+        catalogs.append({
+            'url': f'https://example.invalid/{store.lower()}/{valid_from:%Y-%m-%d}/{i % CATALOGS_PER_WEEK}',
+            'valid_from': valid_from.isoformat(),
+            'valid_to': (valid_from + timedelta(days=6)).isoformat(),
+            'last_updated': start.isoformat(),
+        })
+    return catalogs
+
+
+def write_history(total: int):
+    per_store = max(total // len(STORES), 1)
+    for store in STORES:
+        with open(f'data/index-{store.lower()}.json', 'w', encoding='utf-8') as f:
+            json.dump(synthetic_catalogs(per_store, store), f, indent=2)
+
+
+def timed(func, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {'best': round(min(samples), 6), 'median': round(statistics.median(samples), 6), 'runs': repeat}
+
+
+def bench_end_to_end(server, repeat: int):
+    """Wall time of a full `python -m scripts` run in a fresh working directory."""
+    env = dict(os.environ, AKCIOS_HOST_MAP=host_map_env(server), PYTHONPATH=REPO_ROOT)
+    samples = []
+    for _ in range(repeat):
+        with workdir():
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-m', 'scripts', '--no-cache'], env=env, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            samples.append(time.perf_counter() - start)
+    return {'best': round(min(samples), 6), 'median': round(statistics.median(samples), 6), 'runs': repeat}
+
+
+def bench_crawlers(server, repeat: int):
+    """get_catalog_info latency per crawler, without the HTTP cache."""
+    from scripts.http_client import HttpClient
+    from scripts.registry import create_crawlers, stores
+
+    http = HttpClient(host_map=host_map(server))
+    results = {}
+    for crawler in create_crawlers(stores(), http=http):
+        found = len(crawler.get_catalog_info())
+        results[crawler.store_name] = dict(timed(crawler.get_catalog_info, repeat), catalogs=found)
+    http.close()
+    return results
+
+
+def bench_update_index(scales, repeat: int):
+    """Cost of merging two new catalogs into an index holding ``scale`` catalogs."""
+    from scripts.catalog import Catalog
+    from scripts.registry import create_crawlers
+
+    results = {}
+    for scale in scales:
+        with workdir():
+            with open('data/index-lidl.json', 'w', encoding='utf-8') as f:
+                json.dump(synthetic_catalogs(scale, 'LIDL'), f, indent=2)
+            crawler, = create_crawlers(['LIDL'])
+            new = [Catalog.from_dict(c, 'LIDL') for c in synthetic_catalogs(2, 'NEW')]
+            results[str(scale)] = timed(lambda: crawler.update_index_file(new), repeat)
+    return results
+
+
+def bench_load_catalogs(scales, repeat: int):
+    """Loading ``scale`` catalogs from the JSON index versus its binary snapshot."""
+    import tracemalloc
+    from scripts.catalog import Catalog
+    from scripts.index_store import load_index, read_catalogs, snapshot_file
+
+    def from_json():
+        return [Catalog.from_dict(c, 'LIDL') for c in load_index('data/index-lidl.json')]
+
+    def peak(func):
+        tracemalloc.start()
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak_bytes
+
+    results = {}
+    for scale in scales:
+        with workdir():
+            with open('data/index-lidl.json', 'w', encoding='utf-8') as f:
+                json.dump(synthetic_catalogs(scale, 'LIDL'), f, indent=2)
+            read_catalogs('data/index-lidl.json', 'LIDL')  # Writes the snapshot
+            snapshot = lambda: read_catalogs('data/index-lidl.json', 'LIDL')
+            results[str(scale)] = {
+                'json': dict(timed(from_json, repeat), peak_bytes=peak(from_json),
+                             file_bytes=os.path.getsize('data/index-lidl.json')),
+                'snapshot': dict(timed(snapshot, repeat), peak_bytes=peak(snapshot),
+                                 file_bytes=os.path.getsize(snapshot_file('data/index-lidl.json'))),
+            }
+    return results
+
+
+def output_size():
+    total, files = 0, 0
+    for root, _, names in os.walk('.'):
+        for name in names:
+            if name.endswith('.html'):
+                total += os.path.getsize(os.path.join(root, name))
+                files += 1
+    return {'landing_bytes': os.path.getsize('index.html'), 'total_bytes': total, 'files': files}
+
+
+def bench_generate_html(scales, repeat: int):
+    """Full render time and output size with ``scale`` stored catalogs."""
+    from scripts.generate_index import generate_html
+
+    results = {}
+    for scale in scales:
+        with workdir():
+            write_history(scale)
+            result = timed(lambda: generate_html(force=True), repeat)
+            result['unchanged'] = timed(generate_html, 1)['best']
+            result.update(output_size())
+            results[str(scale)] = result
+    return results
+
+
+def run(scales, latency: float, error_rate: float, repeat: int):
+    server = start_server(latency=latency, error_rate=error_rate)
+    try:
+        results = {
+            'started_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'server': {'latency': latency, 'error_rate': error_rate},
+            'end_to_end': bench_end_to_end(server, repeat),
+            'crawlers': bench_crawlers(server, repeat),
+            'update_index_file': bench_update_index(scales, repeat),
+            'load_catalogs': bench_load_catalogs(scales, repeat),
+            'generate_html': bench_generate_html(scales, repeat),
+            'aldi_extract': bench_aldi_extract.run(repeat=repeat),
+            'search': {str(scale): bench_search.run(offers=scale) for scale in scales},
+        }
+        results['server']['requests'] = server.requests
+    finally:
+        server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the akcios benchmark suite.')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--scales', default='100,10000,100000',
+                        help='Comma separated numbers of stored catalogs (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Seconds of latency added by the stand-in server (default: %(default)s)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of requests answered with 503 (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # The crawlers log at DEBUG; keep benchmark output readable
+    logging.disable(logging.INFO)
+
+    scales = [int(scale) for scale in args.scales.split(',')]
+    results = run(scales, args.latency, args.error_rate, args.repeat)
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload + '\n')
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
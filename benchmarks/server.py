@@ -0,0 +1,141 @@
+"""
+Local stand-in for the retailer sites.
+
+Serves recorded responses from benchmarks/fixtures/routes.json. Requests are
+addressed as http://127.0.0.1:<port>/<original host>/<original path>, which is
+what AKCIOS_HOST_MAP (see host_map()) makes the crawlers send. Unknown paths
+get a 404. Latency and 503 errors can be injected to exercise timeouts and
+retries.
+
+Usage: python -m benchmarks.server [--port 8000] [--latency 0.05] [--error-rate 0.1]
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Hosts the crawlers talk to
+HOSTS = ('www.aldi.hu', 'www.lidl.hu', 'www.spar.hu', 'tesco.hu')
+
+
+class Route:
+    def __init__(self, host: str, path: str, status: int, body: Optional[str] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        self.host = host
+        self.path = re.compile(path)
+        self.status = status
+        self.headers = headers or {}
+        self.body = b''
+        if body:
+            with open(os.path.join(FIXTURES_DIR, body), 'rb') as f:
+                self.body = f.read()
+
+
+def load_routes(path: str = os.path.join(FIXTURES_DIR, 'routes.json')) -> List[Route]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [Route(**route) for route in json.load(f)]
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, routes: List[Route], latency: float = 0.0, error_rate: float = 0.0):
+        super().__init__(address, StandInHandler)
+        self.routes = routes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def match(self, host: str, path: str) -> Optional[Route]:
+        for route in self.routes:
+            if route.host == host and route.path.search(path):
+                return route
+        return None
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self, send_body: bool):
+        server = self.server
+        with server._lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        _, host, path = self.path.split('/', 2) if self.path.count('/') >= 2 else ('', '', '')
+        path = '/' + urlsplit(path).path
+        route = server.match(host, path)
+
+        if server.error_rate and random.random() < server.error_rate:
+            status, headers, body = 503, {'Retry-After': '0'}, b''
+        elif route is None:
+            status, headers, body = 404, {}, b''
+        else:
+            status, headers, body = route.status, dict(route.headers), route.body
+            etag = headers.get('ETag')
+            if etag and self.headers.get('If-None-Match') == etag:
+                status, body = 304, b''
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port: int = 0, latency: float = 0.0, error_rate: float = 0.0) -> StandInServer:
+    """Start the stand-in server in a background thread."""
+    server = StandInServer(('127.0.0.1', port), load_routes(), latency, error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def host_map(server: StandInServer) -> Dict[str, str]:
+    """URL prefixes to redirect to the stand-in server, for HttpClient(host_map=...)."""
+    base = f'http://127.0.0.1:{server.server_port}'
+    return {f'https://{host}': f'{base}/{host}' for host in HOSTS}
+
+
+def host_map_env(server: StandInServer) -> str:
+    """The same mapping in AKCIOS_HOST_MAP format, for subprocess runs."""
+    return ','.join(f'{prefix}={target}' for prefix, target in host_map(server).items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve recorded retailer responses locally.')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    args = parser.parse_args()
+
+    server = StandInServer(('127.0.0.1', args.port), load_routes(), args.latency, args.error_rate)
+    print(f'AKCIOS_HOST_MAP={host_map_env(server)}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
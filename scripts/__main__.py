@@ -1,37 +1,456 @@
-from .aldi_crawler import AldiCrawler
-from .lidl_crawler import LidlCrawler
-from .spar_crawler import SparCrawler
-from .tesco_crawler import TescoCrawler
-from .generate_index import generate_html
+from . import clock
+from .budget import CRAWL_SHARE, MAX_RESERVE_SHARE, RENDER_RESERVE, Budget
+from .catalog_db import STORAGE_BACKENDS, get_storage, set_storage
+from .http_cache import DEFAULT_NEGATIVE_TTL
+from .metrics import metrics
+from .registry import create_crawlers, parse_stores, set_targets_file
+from .runner import DEFAULT_STORE_TIMEOUT
+from .scheduler import DEFAULT_PER_HOST, DEFAULT_WORKERS
+from .shards import RUN_ID_ENV, Shard, ShardError, default_run_id
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Optional
+import argparse
+import json
 import logging
+import os
+import sys
+import time
+
+# Networking and HTML parsing (requests, bs4, the crawler modules) are only
+# imported by crawl(), so `python -m scripts render` starts fast.
 
 logger = logging.getLogger(__name__)
 
-def main():
+def crawl_options() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False)
+    group = parser.add_argument_group('crawl options')
+    group.add_argument('--stores', default=None,
+                       help="Comma separated stores to crawl; globs like 'lidl*' match several "
+                            "(default: every target in the targets file)")
+    group.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help='Concurrent requests across all stores (default: %(default)s)')
+    group.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST,
+                       help='Concurrent requests against one host (default: %(default)s)')
+    group.add_argument('--timeout', type=float, default=DEFAULT_STORE_TIMEOUT,
+                       help='Deadline in seconds for each store crawler (default: %(default)s)')
+    group.add_argument('--connect-timeout', type=float, default=None,
+                       help='HTTP connect timeout in seconds (default: HttpClient setting)')
+    group.add_argument('--read-timeout', type=float, default=None,
+                       help='HTTP read timeout in seconds (default: HttpClient setting)')
+    group.add_argument('--retries', type=int, default=3,
+                       help='Retries for 429/5xx responses and connection errors (default: %(default)s)')
+    group.add_argument('--http2', action='store_true',
+                       help='Use HTTP/2 when httpx[http2] is installed')
+    group.add_argument('--weeks-back', type=int, default=None,
+                       help='Search catalogs published up to this many weeks ago (default: store setting)')
+    group.add_argument('--weeks-ahead', type=int, default=None,
+                       help='Search catalogs published up to this many weeks ahead (default: store setting)')
+    group.add_argument('--publish-days', default=None,
+                       help='Comma separated publish weekdays to try, 0 = Monday (default: store setting)')
+    group.add_argument('--compact', action='store_true',
+                       help='Write data/index-*.json without indentation')
+    group.add_argument('--no-cache', action='store_true',
+                       help='Do not use the on-disk HTTP cache in data/http-cache')
+    group.add_argument('--negative-ttl', type=float, default=DEFAULT_NEGATIVE_TTL,
+                       help='Seconds a 404 from a URL probe is remembered (default: %(default)s)')
+    group.add_argument('--no-breakers', action='store_true',
+                       help='Ignore the per-host circuit breakers in data/circuit-breakers.json')
+    cassette = group.add_mutually_exclusive_group()
+    cassette.add_argument('--record', metavar='CASSETTE', default=None,
+                          help='Record every HTTP interaction into a gzipped cassette file')
+    cassette.add_argument('--replay', metavar='CASSETTE', default=None,
+                          help='Answer every HTTP request from a recorded cassette, without network access; '
+                               'time is frozen to the recording unless --freeze-time is given')
+    group.add_argument('--replay-latency', action='store_true',
+                       help='With --replay, delay each response by the time it took when recorded')
+    group.add_argument('--images', action='store_true',
+                       help='Download catalog page images and thumbnails into data/images')
+    group.add_argument('--offers', action='store_true',
+                       help='Extract product offers into data/offers and update the search index')
+    return parser
+
+def budget_options() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--budget', type=float, default=None,
+                        help='Time budget in seconds for the whole run; store deadlines and HTTP '
+                             f'timeouts are cut to fit, keeping {RENDER_RESERVE:.0f}s but at most '
+                             f'{MAX_RESERVE_SHARE * 100:.0f}%% of it to render (default: none)')
+    return parser
+
+def shard_arg(value: str) -> Shard:
+    try:
+        return Shard.parse(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def shard_options() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--shard', type=shard_arg, default=None, metavar='I/N',
+                        help='Crawl only shard I of N of the selected stores and write a shard manifest '
+                             'under data/shards instead of rendering; combine the shards with merge')
+    return parser
+
+def run_id_option() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--run-id', default=None,
+                        help=f'Identifies the shards of one run; shards write ${RUN_ID_ENV} or local-<date> '
+                             'by default, merge takes the run of the latest shard')
+    return parser
+
+def render_options() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False)
+    group = parser.add_argument_group('render options')
+    group.add_argument('--window-weeks', type=int, default=None,
+                       help='Read catalogs valid during the last N weeks; archive months before are kept '
+                            'as last built (default: 8)')
+    group.add_argument('--force', action='store_true',
+                       help='Read every catalog and rebuild pages and compressed outputs even if their '
+                            'inputs are unchanged')
+    return parser
+
+def common_options() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--storage', choices=STORAGE_BACKENDS, default=get_storage(),
+                        help='Catalog storage backend; sqlite keeps exporting index-*.json (default: %(default)s)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Dump cProfile stats per stage into data/profiles')
+    parser.add_argument('--targets', default=None,
+                        help='Crawl targets file (default: $AKCIOS_TARGETS or scripts/targets.json)')
+    freeze_time_option(parser)
+    return parser
+
+def freeze_time_option(parser: argparse.ArgumentParser):
+    parser.add_argument('--freeze-time', type=datetime.fromisoformat, default=None, metavar='YYYY-MM-DDTHH:MM',
+                        help='Run as if it were this moment, for reproducible crawls and pages')
+
+def search_options() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('query', help='Product to look for, e.g. "vaj" or "trappista sajt"')
+    parser.add_argument('--date', type=date.fromisoformat, default=None,
+                        help='Only offers valid on this day, YYYY-MM-DD (default: today)')
+    parser.add_argument('--any-date', action='store_true',
+                        help='Search every stored catalog, whatever its validity')
+    parser.add_argument('--stores', default=None,
+                        help='Comma separated stores to search (default: all)')
+    parser.add_argument('--limit', type=int, default=20)
+    freeze_time_option(parser)
+    return parser
+
+def daemon_options() -> argparse.ArgumentParser:
+    from .daemon import DEFAULT_COVERAGE, DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL
+
+    parser = argparse.ArgumentParser(add_help=False)
+    group = parser.add_argument_group('daemon options')
+    group.add_argument('--min-interval', type=float, default=DEFAULT_MIN_INTERVAL / 60,
+                       help='Minutes between polls inside a release window (default: %(default)s)')
+    group.add_argument('--max-interval', type=float, default=DEFAULT_MAX_INTERVAL / 60,
+                       help='Longest wait in minutes between polls outside release windows (default: %(default)s)')
+    group.add_argument('--coverage', type=float, default=DEFAULT_COVERAGE,
+                       help='Share of past releases the release windows cover (default: %(default)s)')
+    group.add_argument('--plan', action='store_true',
+                       help='Print each store\'s release windows and next poll, then exit')
+    return parser
+
+def parse_args(argv=None):
+    common, crawl_opts, render_opts = common_options(), crawl_options(), render_options()
+    budget_opts, shard_opts, run_id_opt = budget_options(), shard_options(), run_id_option()
+    parser = argparse.ArgumentParser(
+        prog='python -m scripts',
+        description='Crawl store catalogs and generate the index page. '
+                    'Without a command, crawls every store and then renders.',
+        parents=[common, crawl_opts, render_opts, budget_opts, shard_opts, run_id_opt],
+    )
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('crawl', parents=[common, crawl_opts, budget_opts, shard_opts, run_id_opt],
+                        help='Crawl the selected stores and update their index files')
+    commands.add_parser('render', parents=[common, render_opts],
+                        help='Generate the pages from stored catalogs, without network access')
+    merge_parser = commands.add_parser('merge', parents=[common, render_opts, run_id_opt],
+                                       help='Check the shard manifests in data/shards, combine the shards '
+                                            'and render once')
+    merge_parser.add_argument('--allow-missing', action='store_true',
+                              help='Merge and render even if some shards have no manifest')
+    commands.add_parser('search', parents=[search_options()],
+                        help='Find product offers across stores in the extracted catalogs')
+    commands.add_parser('daemon', parents=[common, crawl_opts, render_opts, daemon_options()],
+                        help='Keep running, polling each store around its usual release time')
+    args = parser.parse_args(argv)
+    set_targets_file(getattr(args, 'targets', None))
+    if args.command == 'daemon' and args.freeze_time is not None:
+        parser.error('--freeze-time cannot be used with daemon, which polls against the real clock')
+    if getattr(args, 'budget', None) is not None and args.budget <= 0:
+        parser.error('--budget must be a positive number of seconds')
+    if args.command not in ('render', 'search', 'merge'):
+        try:
+            args.stores = parse_stores(args.stores)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+@contextmanager
+def transport(args, negative_ttl: Optional[float] = None, budget: Optional[Budget] = None):
+    """
+    Shared HTTP client and scheduler for the crawlers; yields the HTTP cache (or None).
+    With a budget, no request runs into the time kept for rendering.
+    """
+    from .cassette import Cassette
+    from .circuit import STATE_FILE as BREAKERS_FILE, CircuitBreakers
+    from .http_cache import DEFAULT_CACHE_DIR, HttpCache
+    from .http_client import HttpClient, set_http_client, DEFAULT_TIMEOUT
+    from .scheduler import Scheduler, set_scheduler
+
+    cassette = None
+    if args.record:
+        cassette = Cassette(args.record, 'record')
+    elif args.replay:
+        cassette = Cassette(args.replay, 'replay', latency=args.replay_latency)
+        if not clock.is_frozen():
+            # Candidate URLs and "this week" are computed from now
+            clock.freeze_time(cassette.recorded_at)
+    # Cached responses and open circuits would change which requests a recorded run sends
+    isolated = cassette is not None
+    ttl = negative_ttl if negative_ttl is not None else args.negative_ttl
+    # Shards running side by side each keep their own cache and breaker state
+    shard = getattr(args, 'shard', None)
+    cache_dir = os.path.join(DEFAULT_CACHE_DIR, shard.name) if shard else DEFAULT_CACHE_DIR
+    breakers_file = shard.path('circuit-breakers.json') if shard else BREAKERS_FILE
+    cache = None if args.no_cache or isolated else HttpCache(cache_dir, negative_ttl=ttl)
+    breakers = None if args.no_breakers or isolated else CircuitBreakers(breakers_file)
+    http = HttpClient(
+        timeout=(args.connect_timeout or DEFAULT_TIMEOUT[0], args.read_timeout or DEFAULT_TIMEOUT[1]),
+        retries=args.retries,
+        http2=args.http2,
+        cache=cache,
+        breakers=breakers,
+        deadline=budget.deadline - budget.reserve if budget is not None and budget.deadline is not None else None,
+        cassette=cassette,
+        # A connection per scheduler worker, to every host: the per-host limit does not bound
+        # it when AKCIOS_HOST_MAP sends every store to one server or a host's limit is raised
+        pool_connections=args.workers,
+        pool_maxsize=args.workers,
+    )
+    set_http_client(http)
+    # One pool for every store: limits hold globally and per host, and stores take turns
+    scheduler = Scheduler(max_workers=args.workers, per_host=args.per_host)
+    set_scheduler(scheduler)
+    try:
+        yield cache
+    finally:
+        scheduler.shutdown()
+        set_scheduler(None)
+        http.close()
+        if cache is not None:
+            logger.info(f"HTTP cache: {cache.summary()}")
+            for name, value in cache.stats.items():
+                metrics.count('http_cache_total', value, result=name)
+        if breakers is not None:
+            logger.info(f"Circuit breakers: {breakers.summary()}")
+        if cassette is not None:
+            logger.info(f"Cassette {cassette.path}: {cassette.summary()}")
+
+def crawler_options(args) -> dict:
+    options = {'compact_index': True} if args.compact else {}
+    if args.weeks_back is not None or args.weeks_ahead is not None:
+        back = args.weeks_back if args.weeks_back is not None else 1
+        ahead = args.weeks_ahead if args.weeks_ahead is not None else 0
+        options['week_offsets'] = range(-back, ahead + 1)
+    if args.publish_days:
+        options['publish_weekdays'] = [int(day) for day in args.publish_days.split(',')]
+    return options
+
+def crawl_stages(args, crawlers, results, shard: Optional[Shard] = None):
+    """
+    The optional stages that work on the catalogs a crawl found: images and
+    offers. A shard leaves the shared image and search indexes to merge;
+    returns the offer segments it changed.
+    """
+    jobs = [(crawler, result.found) for crawler, result in zip(crawlers, results)
+            if result.status == 'ok']
+    segments = [] if shard else None
+
+    if args.images:
+        from .images import ImageStore, download_catalog_images
+        from .shards import IMAGES_INDEX_FILE
+        store = ImageStore(save_to=shard.path(IMAGES_INDEX_FILE)) if shard else None
+        try:
+            download_catalog_images(jobs, store=store)
+        except Exception as e:
+            # Images are a by-product; the index files are already written
+            logger.error(f"Image download failed: {e}", exc_info=True)
+
+    if args.offers:
+        from .offers import extract_offers
+        try:
+            extract_offers(jobs, changed_segments=segments)
+        except Exception as e:
+            logger.error(f"Offer extraction failed: {e}", exc_info=True)
+    return segments or []
+
+def crawl(args, budget: Optional[Budget] = None):
+    """
+    Run the selected crawlers concurrently, each with its own deadline; with a
+    budget, the deadlines share CRAWL_SHARE of it and leave the rest for the
+    image and offer stages and rendering.
+    """
+    from .http_client import get_http_client
+    from .runner import run_crawlers
+
+    budget = budget or Budget()
+    shard = args.shard
+    names = shard.assign(args.stores) if shard else args.stores
+    if shard:
+        from .shards import clear_manifest
+        clear_manifest(shard)
+    with transport(args, budget=budget):
+        logger.info(f"Starting crawlers{f' for shard {shard}' if shard else ''}: {', '.join(names) or 'none'}")
+        crawlers = create_crawlers(names, **crawler_options(args))
+        timeout = args.timeout
+        if budget.deadline is not None:
+            timeout = min(timeout, budget.phase(CRAWL_SHARE))
+            logger.info(f"Budget: {budget.remaining():.0f}s left, store deadline {timeout:.0f}s")
+        results = run_crawlers(crawlers, timeout=timeout, breakers=get_http_client().breakers)
+        segments = crawl_stages(args, crawlers, results, shard)
+    if shard:
+        from .shards import write_manifest
+        write_manifest(shard, args.stores, results, segments, run_id=args.run_id or default_run_id())
+    return results
+
+def daemon(args):
+    """Poll and render until stopped; see scripts.daemon."""
+    from .daemon import Daemon
+
+    min_interval, max_interval = args.min_interval * 60, args.max_interval * 60
+    # A remembered 404 must not hide a catalog published between two polls
+    with transport(args, negative_ttl=min(args.negative_ttl, min_interval / 2)) as cache:
+        crawlers = create_crawlers(args.stores, **crawler_options(args))
+        runner = Daemon(
+            crawlers,
+            after_crawl=lambda crawled, results: crawl_stages(args, crawled, results),
+            render=lambda: render(args),
+            min_interval=min_interval,
+            max_interval=max_interval,
+            coverage=args.coverage,
+            timeout=args.timeout,
+            cache=cache,
+        )
+        if args.plan:
+            print(json.dumps(runner.plan(), indent=2))
+            return
+        runner.run()
+
+def merge(args):
+    """Validate the shard manifests, fold the shards' state into the shared files and render once."""
+    from .offers import index_segments
+    from .shards import archive_manifests, import_storage, load_manifests, merge_images_index, validate
+
+    manifests = validate(load_manifests(), run_id=args.run_id, allow_missing=args.allow_missing)
+    logger.info(f"Merging {len(manifests)} shards of {manifests[0]['count']}")
+    import_storage(manifests)
+    merge_images_index(manifests)
+    segments = [segment for manifest in manifests for segment in manifest['segments']]
+    if segments:
+        index_segments(segments)
+    render(args)
+    archive_manifests(manifests)
+    return [crawler for manifest in manifests for crawler in manifest['crawlers']]
+
+def render(args):
+    from .generate_index import generate_html
+
+    logger.info("Generating index page...")
+    generate_html(window_weeks=args.window_weeks, force=args.force)
+
+def search(args):
+    """Print matching offers; reads only data/offers, no network or rendering."""
+    from .search import SearchIndex, find_offers
+
+    index = SearchIndex.load()
+    on = None if args.any_date else (args.date or clock.now().date())
+    stores = parse_stores(args.stores) if args.stores else None
+    start = time.perf_counter()
+    offers = find_offers(args.query, on=on, stores=stores, limit=args.limit, index=index)
+    elapsed = time.perf_counter() - start
+
+    for offer in offers:
+        price = f"{offer['price']:g} Ft"
+        if offer['unit_price'] is not None:
+            price += f" ({offer['unit_price']:g} Ft/{offer['unit'] or 'unit'})"
+        if offer['discount']:
+            price += f" -{offer['discount']}%"
+        print(f"{offer['store']:<6} {offer['valid_from'][:10]}..{offer['valid_to'][:10]}  {offer['name']}  {price}")
+    print(f"{len(offers)} offers in {elapsed * 1000:.2f} ms", file=sys.stderr)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'search':
+        clock.freeze_time(args.freeze_time)
+        try:
+            search(args)
+        except ValueError as e:
+            sys.exit(f"error: {e}")
+        return
+
+    logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+    set_storage(args.storage)
+    shard = getattr(args, 'shard', None)
+    if shard and args.storage == 'sqlite':
+        # The database is shared; merge imports the shards' index files into it
+        logger.info("Shards write JSON index files only; merge updates the SQLite storage")
+        set_storage('json')
+    clock.freeze_time(args.freeze_time)
+    if args.profile:
+        metrics.enable_profiling()
+
+    if args.command == 'daemon':
+        # Writes its own report after every poll
+        daemon(args)
+        return
+
+    if args.command == 'merge':
+        try:
+            crawlers = merge(args)
+        except ShardError as e:
+            logger.error(f"Cannot merge shards: {e}")
+            sys.exit(1)
+        metrics.write(extra={'command': 'merge', 'crawlers': crawlers})
+        return
+
+    budget = Budget(getattr(args, 'budget', None))
+    results = []
     try:
-        # Run crawlers
-        logger.info("Starting crawlers...")
-        
-        aldi_crawler = AldiCrawler()
-        aldi_crawler.run()
-        
-        lidl_crawler = LidlCrawler()
-        lidl_crawler.run()
-        
-        spar_crawler = SparCrawler()
-        spar_crawler.run()
-        
-        tesco_crawler = TescoCrawler()
-        tesco_crawler.run()
-        
-        # Generate index page
-        logger.info("Generating index page...")
-        generate_html()
-        
-        logger.info("All tasks completed successfully")
-        
+        if args.command in (None, 'crawl'):
+            try:
+                results = crawl(args, budget)
+            except Exception as e:
+                # Stores that finished have written their index files; render them anyway
+                logger.error(f"Crawl failed: {e}", exc_info=True)
+
+        if args.command in (None, 'render'):
+            if shard:
+                logger.info(f"Shard {shard} does not render; run merge once every shard finished")
+            else:
+                render(args)
+
+        by_status = {}
+        for result in results:
+            by_status.setdefault(result.status, []).append(result.store_name)
+        problems = [f"{status}: {', '.join(stores)}" for status, stores in sorted(by_status.items())
+                    if status != 'ok']
+        if problems:
+            logger.warning(f"Completed with stores that did not finish ({'; '.join(problems)})")
+        else:
+            logger.info("All tasks completed successfully")
+
     except Exception as e:
         logger.error(f"Error in main: {e}", exc_info=True)
 
+    finally:
+        files = {}
+        if shard:
+            files = {'report_file': shard.path('run-report.json'), 'prometheus_file': shard.path('metrics.prom')}
+        metrics.write(extra={'command': args.command or 'all',
+                             'crawlers': [r.to_dict() for r in results]}, **files)
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,185 @@
+"""
+Static JSON API under api/v1/, for apps that should not scrape the pages.
+
+    manifest.json       version, plus sha256, size and catalog count per shard
+    weeks/<YYYY-Www>.json  catalog groups whose validity starts in that ISO week
+    stores/<store>/<YYYY-MM>.json  one store's catalogs whose validity starts
+                                   in that month, newest first
+
+Shards cover every stored catalog. A render that only reads recent catalogs
+rewrites the shards of the weeks and months starting in its window and keeps
+the older ones as they are.
+
+Shards hold no values derived from the build date, so a shard only changes
+when its catalogs do. Shards are only written when their hash changes, and
+the manifest version is bumped only then, so a client can poll the small
+manifest and download just the shards whose ``changed_in`` is newer than the
+version it has.
+"""
+from datetime import date
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from .catalog import Catalog
+from .fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+API_DIR = os.path.join('api', 'v1')
+MANIFEST_FILE = 'manifest.json'
+SCHEMA_VERSION = 2
+
+
+def week_key(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def period_start(name: str) -> date:
+    """First day of the week or month a shard covers."""
+    key = os.path.splitext(os.path.basename(name))[0]
+    if name.startswith('weeks/'):
+        year, week = key.split('-W')
+        return date.fromisocalendar(int(year), int(week), 1)
+    year, month = key.split('-')
+    return date(int(year), int(month), 1)
+
+
+def month_counts(manifest: Dict[str, Any], before: Optional[date] = None) -> Dict[str, int]:
+    """Catalogs per month ('YYYY-MM') in the store shards, optionally only months starting before ``before``."""
+    counts: Dict[str, int] = {}
+    for name, entry in manifest.get('shards', {}).items():
+        if not name.startswith('stores/'):
+            continue
+        if before is not None and period_start(name) >= before:
+            continue
+        month = os.path.splitext(os.path.basename(name))[0]
+        counts[month] = counts.get(month, 0) + entry['catalogs']
+    return counts
+
+
+def catalog_record(catalog: Catalog) -> Dict[str, Any]:
+    return {'store': catalog.store, **catalog.to_dict()}
+
+
+def _encode(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def store_shard(catalog: Catalog) -> str:
+    return f"stores/{catalog.store.lower()}/{catalog.valid_from.strftime('%Y-%m')}.json"
+
+
+def unpublished(catalogs: Sequence[Catalog], directory: str = API_DIR) -> List[Catalog]:
+    """Catalogs that their store's month shard does not hold as they are now."""
+    published: Dict[str, Set[bytes]] = {}
+    missing = []
+    for catalog in catalogs:
+        name = store_shard(catalog)
+        if name not in published:
+            try:
+                with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                    records = json.load(f)['catalogs']
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                records = []
+            published[name] = {_encode(record) for record in records}
+        if _encode(catalog_record(catalog)) not in published[name]:
+            missing.append(catalog)
+    return missing
+
+
+def build_shards(groups: Sequence[Dict[str, Any]], catalogs: Sequence[Catalog]) -> Dict[str, Any]:
+    """Shard path (relative to the API directory) -> content, from generate_html's catalog groups."""
+    weeks: Dict[str, List[Dict[str, Any]]] = {}
+    for group in sorted(groups, key=lambda g: (g['valid_from'], g['valid_to'])):
+        weeks.setdefault(group['week'], []).append({
+            'valid_from': group['valid_from'].isoformat(),
+            'valid_to': group['valid_to'].isoformat(),
+            'catalogs': [catalog_record(c) for c in sorted(group['catalogs'], key=lambda c: (c.store, c.url))],
+        })
+
+    stores: Dict[str, List[Catalog]] = {}
+    for catalog in catalogs:
+        stores.setdefault(store_shard(catalog), []).append(catalog)
+
+    shards: Dict[str, Any] = {}
+    for key, week_groups in weeks.items():
+        shards[f'weeks/{key}.json'] = {'week': key, 'groups': week_groups}
+    for name, store_catalogs in stores.items():
+        store_catalogs.sort(key=lambda c: (c.valid_from, c.url), reverse=True)
+        shards[name] = {'store': store_catalogs[0].store, 'month': store_catalogs[0].valid_from.strftime('%Y-%m'),
+                        'catalogs': [catalog_record(c) for c in store_catalogs]}
+    return shards
+
+
+def load_manifest(directory: str = API_DIR) -> Dict[str, Any]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Error reading {path}, rewriting every shard: {e}")
+    return {'version': 0, 'shards': {}}
+
+
+def is_current(manifest: Dict[str, Any]) -> bool:
+    """Whether the manifest was written with this schema, so its shards can be kept."""
+    return manifest.get('schema') == SCHEMA_VERSION
+
+
+def write_api(groups: Sequence[Dict[str, Any]], catalogs: Sequence[Catalog],
+              since: Optional[date] = None, directory: str = API_DIR) -> Dict[str, Any]:
+    """
+    Write the changed shards and the manifest; returns the manifest.
+    ``groups`` and ``catalogs`` must hold every catalog valid since ``since``
+    (all of them without it). Shards of weeks and months starting before
+    ``since`` are kept as they are; the others that are not built from
+    ``groups`` and ``catalogs`` are removed.
+    """
+    previous = load_manifest(directory)
+    old_shards: Dict[str, Dict[str, Any]] = previous.get('shards', {})
+    version = previous.get('version', 0) + 1
+    if since is not None and not is_current(previous):
+        raise ValueError(f"{MANIFEST_FILE} has schema {previous.get('schema')}, rebuild the API from every catalog")
+
+    shards: Dict[str, Dict[str, Any]] = {}
+    if since is not None:
+        shards.update((name, entry) for name, entry in old_shards.items() if period_start(name) < since)
+    written = 0
+    for name, content in build_shards(groups, catalogs).items():
+        if since is not None and period_start(name) < since:
+            # Only part of an earlier period was read; its shard stays as it is
+            continue
+        payload = _encode(content)
+        digest = hashlib.sha256(payload).hexdigest()
+        path = os.path.join(directory, name)
+        old = old_shards.get(name)
+        if old is not None and old['sha256'] == digest and os.path.exists(path):
+            shards[name] = old
+            continue
+        atomic_write(path, payload)
+        written += 1
+        count = len(content['catalogs']) if 'catalogs' in content else \
+            sum(len(g['catalogs']) for g in content['groups'])
+        shards[name] = {'sha256': digest, 'bytes': len(payload), 'catalogs': count, 'changed_in': version}
+
+    removed = 0
+    for name, entry in old_shards.items():
+        if name in shards:
+            continue
+        if os.path.exists(os.path.join(directory, name)):
+            os.remove(os.path.join(directory, name))
+        removed += 1
+
+    if not written and not removed and os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        logger.info(f"API unchanged at version {previous['version']}")
+        return previous
+
+    manifest = {'schema': SCHEMA_VERSION, 'version': version, 'shards': dict(sorted(shards.items()))}
+    atomic_write(os.path.join(directory, MANIFEST_FILE), json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+    logger.info(f"API version {version}: {written} shards written, {removed} removed, {len(shards)} total")
+    return manifest
@@ -0,0 +1,258 @@
+"""
+Output stage for the static site.
+
+Stylesheets and scripts are written under content-hashed names
+(assets/styles.<hash>.css), so they can be cached as immutable: a changed
+file gets a new name, and the pages that reference it change with it. The
+rules needed for the first paint are inlined into every page, and the full
+stylesheet loads without blocking rendering.
+
+Every output gets precompressed .gz and, when the brotli module is
+installed, .br siblings for servers that serve them directly (e.g.
+nginx gzip_static/brotli_static). Compression is deterministic, so an
+unchanged page produces byte-identical siblings.
+"""
+import functools
+import gzip
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .build_manifest import BuildManifest, file_hash, inputs_hash
+from .fileio import atomic_write
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = 'assets'
+# Generated files that get .gz/.br siblings
+OUTPUT_PATHS = ('index.html', 'archive', 'search', 'api', ASSETS_DIR)
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+COMPRESSIBLE_SUFFIXES = ('.html', '.css', '.js', '.json')
+HASH_LENGTH = 10
+# Below this, compression headers outweigh the savings
+MIN_COMPRESS_BYTES = 256
+# Critical CSS of the last build, reused while styles.css and the page classes are unchanged
+CRITICAL_CSS_FILE = 'data/critical.css'
+# Rebuild the assets when their build code changes
+ASSETS_HASH = file_hash(__file__)
+
+# State that only exists after interaction, so it is never needed for the first paint
+_INTERACTIVE_PSEUDO = re.compile(r':(hover|focus|focus-visible|focus-within|active|visited)\b')
+_CLASS_RE = re.compile(r'\.([A-Za-z_][\w-]*)')
+
+
+def minify_css(css: str) -> str:
+    # Remove comments
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    # Remove whitespace
+    css = re.sub(r'\s+', ' ', css)
+    # Remove spaces around special characters
+    css = re.sub(r'\s*([\{\}\:\;\,])\s*', r'\1', css)
+    return css.strip()
+
+
+def parse_rules(css: str) -> List[Tuple[str, str]]:
+    """Top-level (prelude, body) pairs of minified CSS; at-rule bodies are left unparsed."""
+    rules = []
+    position = 0
+    while position < len(css):
+        start = css.find('{', position)
+        if start < 0:
+            break
+        depth, end = 1, start + 1
+        while depth and end < len(css):
+            depth += {'{': 1, '}': -1}.get(css[end], 0)
+            end += 1
+        rules.append((css[position:start].strip(), css[start + 1:end - 1]))
+        position = end
+    return rules
+
+
+def _is_critical(selector: str, classes: Set[str]) -> bool:
+    if _INTERACTIVE_PSEUDO.search(selector):
+        return False
+    return set(_CLASS_RE.findall(selector)) <= classes
+
+
+def critical_css(css: str, classes: Set[str]) -> str:
+    """
+    The rules of minified css that can apply to markup using only ``classes``,
+    leaving out styles of elements created by scripts and interaction states.
+    """
+    kept = []
+    for prelude, body in parse_rules(css):
+        if prelude.startswith('@media') or prelude.startswith('@supports'):
+            inner = critical_css(body, classes)
+            if inner:
+                kept.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            kept.append(f'{prelude}{{{body}}}')
+        elif any(_is_critical(selector, classes) for selector in prelude.split(',')):
+            kept.append(f'{prelude}{{{body}}}')
+    return ''.join(kept)
+
+
+def hashed_name(path: str, content: bytes, directory: str = ASSETS_DIR) -> str:
+    """'styles.css' -> 'assets/styles.<hash>.css'."""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return f'{directory}/{stem}.{digest}{ext}'
+
+
+def write_asset(path: str, content: bytes, directory: str = ASSETS_DIR) -> str:
+    """
+    Write content under its hashed name and remove older versions of the
+    same asset. Returns the hashed path.
+    """
+    target = hashed_name(path, content, directory)
+    if not os.path.exists(target):
+        atomic_write(target, content)
+        logger.info(f"Wrote {target}")
+    stem, ext = os.path.splitext(os.path.basename(path))
+    pattern = re.compile(rf'{re.escape(stem)}\.[0-9a-f]{{{HASH_LENGTH}}}{re.escape(ext)}')
+    for name in os.listdir(directory):
+        base = name
+        for suffix in COMPRESSED_SUFFIXES:
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+        if pattern.fullmatch(base) and base != os.path.basename(target):
+            os.remove(os.path.join(directory, name))
+    return target
+
+
+@functools.lru_cache(maxsize=None)
+def _brotli():
+    # Cached: a failed import is retried, and slowly, on every call
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compress(content: bytes) -> Dict[str, bytes]:
+    """Compressed variants of content by suffix; .br only with the brotli module."""
+    # mtime=0 keeps the output identical for identical input
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    brotli = _brotli()
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    return variants
+
+
+def iter_outputs(paths: Iterable[str] = OUTPUT_PATHS) -> Iterable[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    yield os.path.join(root, name)
+        elif os.path.exists(path):
+            yield path
+
+
+@metrics.timed('precompress')
+def precompress(manifest: BuildManifest, paths: Iterable[str] = OUTPUT_PATHS) -> Dict[str, Dict[str, int]]:
+    """
+    Write compressed siblings of every output that changed since the last
+    build, drop siblings whose source is gone or too small to compress, and
+    return the byte sizes per file and encoding.
+    """
+    sizes: Dict[str, Dict[str, int]] = {}
+    compressed = 0
+    for path in iter_outputs(paths):
+        if path.endswith(COMPRESSED_SUFFIXES):
+            source = path[:-3]
+            if not os.path.exists(source):
+                os.remove(path)
+            continue
+        if not path.endswith(COMPRESSIBLE_SUFFIXES):
+            continue
+
+        sizes[path] = {'raw': os.path.getsize(path)}
+        if sizes[path]['raw'] < MIN_COMPRESS_BYTES:
+            for suffix in COMPRESSED_SUFFIXES:
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            continue
+
+        digest = file_hash(path)
+        siblings = [path + '.gz'] + ([path + '.br'] if _brotli() is not None else [])
+        if not all(manifest.is_fresh(sibling, digest) for sibling in siblings):
+            with open(path, 'rb') as f:
+                content = f.read()
+            for suffix, data in compress(content).items():
+                atomic_write(path + suffix, data)
+                manifest.record(path + suffix, digest)
+            compressed += 1
+
+        for sibling in siblings:
+            sizes[path][sibling[-2:]] = os.path.getsize(sibling)
+    logger.info(f"Precompressed {compressed} changed outputs")
+    return sizes
+
+
+def report_sizes(sizes: Dict[str, Dict[str, int]]):
+    """
+    Log a per-file size table and record the sizes as gauges. Totals count
+    the raw size for files without a sibling, since that is what gets served.
+    """
+    encodings = ['raw'] + sorted({encoding for entry in sizes.values() for encoding in entry} - {'raw'})
+    width = max((len(path) for path in sizes), default=5)
+    lines = [f"{'file':<{width}}" + ''.join(f"  {encoding:>8}" for encoding in encodings)]
+    totals: Dict[str, int] = {}
+    for path, entry in sorted(sizes.items()):
+        lines.append(f"{path:<{width}}" + ''.join(f"  {entry.get(encoding, '-'):>8}" for encoding in encodings))
+        for encoding in encodings:
+            totals[encoding] = totals.get(encoding, 0) + entry.get(encoding, entry['raw'])
+        for encoding, size in entry.items():
+            metrics.gauge('output_bytes', size, file=path, encoding=encoding)
+    lines.append(f"{'total':<{width}}" + ''.join(f"  {totals.get(encoding, 0):>8}" for encoding in encodings))
+    logger.info("Output sizes (bytes):\n" + '\n'.join(lines))
+
+
+def _recorded_asset(manifest: BuildManifest, source: str, digest: str) -> Optional[str]:
+    """The hashed asset of source recorded with digest, if it is still on disk."""
+    stem, ext = os.path.splitext(os.path.basename(source))
+    pattern = re.compile(rf'{re.escape(ASSETS_DIR)}/{re.escape(stem)}\.[0-9a-f]{{{HASH_LENGTH}}}{re.escape(ext)}')
+    for output, recorded in manifest.outputs.items():
+        if recorded == digest and pattern.fullmatch(output) and manifest.is_fresh(output, digest):
+            return output
+    return None
+
+
+def build_stylesheet(source: str, classes: Set[str],
+                     manifest: Optional[BuildManifest] = None) -> Tuple[str, str]:
+    """
+    Minify source into a hashed asset; returns (asset path, critical CSS to inline).
+    With a manifest, an unchanged source and class set reuse the last build.
+    """
+    asset_digest = inputs_hash({'source': file_hash(source), 'assets': ASSETS_HASH})
+    critical_digest = inputs_hash({'source': asset_digest, 'classes': sorted(classes)})
+    if manifest is not None:
+        target = _recorded_asset(manifest, source, asset_digest)
+        if target is not None and manifest.is_fresh(CRITICAL_CSS_FILE, critical_digest):
+            logger.debug(f"{target} is up to date")
+            with open(CRITICAL_CSS_FILE, 'r', encoding='utf-8') as f:
+                return target, f.read()
+
+    with metrics.stage('minify_css'):
+        with open(source, 'r', encoding='utf-8') as f:
+            css = minify_css(f.read())
+        target = write_asset(source, css.encode('utf-8'))
+        critical = critical_css(css, classes)
+    atomic_write(CRITICAL_CSS_FILE, critical.encode('utf-8'))
+    if manifest is not None:
+        manifest.record(target, asset_digest)
+        manifest.record(CRITICAL_CSS_FILE, critical_digest)
+    return target, critical
+
+
+def build_script(source: str) -> Optional[str]:
+    """Copy a script to its hashed asset path, or None if it does not exist."""
+    if not os.path.exists(source):
+        return None
+    with open(source, 'rb') as f:
+        return write_asset(source, f.read())
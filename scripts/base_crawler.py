@@ -1,8 +1,18 @@
 from datetime import datetime
-import json
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Sequence, Set
+from urllib.parse import urlsplit
 import os
+from . import clock
+from .candidates import generate_candidates, probe_candidates
+from .catalog_db import CatalogDB, get_storage
+from .http_client import HttpClient, get_http_client
+from .images import extract_image_urls
+from .offers import parse_offers
+from .metrics import metrics
+from .scheduler import Scheduler, get_scheduler
+from .catalog import Catalog, parse_datetime
+from .index_store import catalogs_fingerprint, read_catalogs, write_catalogs
 
 # Configure logging
 logging.basicConfig(
@@ -11,88 +21,214 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
-
 class BaseCrawler:
-    def __init__(self, store_name: str):
+    # Whether validate_url follows redirects before checking the status code
+    follow_redirects = True
+    # How validate_url checks a URL: 'head', or 'get' for servers that mishandle HEAD
+    validation = 'head'
+    # Offer parser for catalog pages: 'jsonld', or 'none' for sites without structured data
+    offer_parser = 'jsonld'
+
+    # Candidate URL search, used by stores that publish on predictable URLs.
+    # Templates are expanded by scripts.candidates.generate_candidates.
+    url_templates: Sequence[str] = ()
+    url_variants: Dict[str, Sequence[str]] = {}
+    # Weeks relative to now: -1 is the current catalog, 0 the upcoming one
+    week_offsets: Sequence[int] = (-1, 0)
+    # Publish weekdays to try, in order of preference (3 = Thursday)
+    publish_weekdays: Sequence[int] = (3,)
+    validity_days = 6
+    valid_to_end_of_day = False
+    validate_candidates = True
+    probe_workers = 8
+    probe_per_host = 4
+    # Write index files without indentation
+    compact_index = False
+    # Upper bound on page images downloaded per catalog
+    max_page_images = 60
+
+    def __init__(self, store_name: str, http: Optional[HttpClient] = None,
+                 week_offsets: Optional[Sequence[int]] = None,
+                 publish_weekdays: Optional[Sequence[int]] = None,
+                 compact_index: Optional[bool] = None,
+                 scheduler: Optional[Scheduler] = None):
         self.store_name = store_name
+        # Shared, pooled transport: probes against the same host reuse connections
+        self.http = http or get_http_client()
+        # Shared worker pool: global and per-host limits hold across all stores
+        self.scheduler = scheduler or get_scheduler()
+        if week_offsets is not None:
+            self.week_offsets = week_offsets
+        if publish_weekdays is not None:
+            self.publish_weekdays = publish_weekdays
+        if compact_index is not None:
+            self.compact_index = compact_index
+
+    @property
+    def hosts(self) -> Set[str]:
+        """Hosts the crawler depends on; the runner skips it while all their circuits are open."""
+        return {urlsplit(template).netloc for template in self.url_templates}
+
+    def validate_url(self, url: str) -> bool:
+        """
+        Check if URL returns a valid response. Only the status code decides;
+        connection errors, timeouts and open circuits are raised, so a store
+        that is down is not mistaken for one that published nothing.
+        """
+        with metrics.stage('validate_url', store=self.store_name):
+            if self.validation == 'get':
+                response = self.http.get(url, stream=True, allow_redirects=self.follow_redirects)
+                response.close()
+                return response.status_code == 200
+            response = self.http.head(url, use_cache=True, allow_redirects=self.follow_redirects)
+            if response.status_code in (403, 405, 501):
+                # Some servers refuse HEAD; fall back to a GET without reading the body
+                response = self.http.get(url, stream=True, allow_redirects=self.follow_redirects)
+                response.close()
+        return response.status_code == 200
     
-    def get_catalog_info(self) -> List[Dict[str, Any]]:
+    def get_catalog_info(self) -> List[Catalog]:
         """
         Fetch and parse catalog information.
-        Should be implemented by child classes.
+        Stores that declare url_templates get a candidate search; others
+        should implement this in child classes.
         """
-        raise NotImplementedError
+        if not self.url_templates:
+            raise NotImplementedError
+
+        now = clock.now()
+        candidates = generate_candidates(
+            self.url_templates,
+            now,
+            week_offsets=self.week_offsets,
+            weekdays=self.publish_weekdays,
+            variants=self.url_variants,
+            validity_days=self.validity_days,
+            valid_to_end_of_day=self.valid_to_end_of_day,
+        )
+        logger.debug(f"Generated {len(candidates)} {self.store_name} candidate URLs")
+
+        if self.validate_candidates:
+            candidates = probe_candidates(
+                candidates,
+                self.validate_url,
+                max_workers=self.probe_workers,
+                per_host=self.probe_per_host,
+                scheduler=self.scheduler,
+                owner=self.store_name,
+            )
+
+        found_at = clock.now()
+        catalogs = [
+            Catalog(candidate.url, candidate.valid_from, candidate.valid_to, found_at, self.store_name)
+            for candidate in candidates
+        ]
+        for catalog in catalogs:
+            logger.debug(f"Created catalog entry: {catalog}")
+
+        logger.info(f"Generated {len(catalogs)} catalog entries")
+        return catalogs
     
-    def update_index_file(self, new_catalogs: List[Dict[str, Any]]):
-        """Update the store-specific index file with new catalog data."""
-        index_file = f'data/index-{self.store_name.lower()}.json'
+    def get_page_image_urls(self, catalog_url: str) -> List[str]:
+        """
+        URLs of the page images of a catalog, for the image download stage:
+        the <img> and og:image tags of the catalog page, at most
+        max_page_images. This is the same for every target; targets.json has
+        no switch for it.
+        """
+        response = self.http.get(catalog_url, use_cache=True)
+        if response.status_code != 200:
+            logger.debug(f"Catalog page {catalog_url} returned {response.status_code}")
+            return []
+        return extract_image_urls(response.text, catalog_url)[:self.max_page_images]
+
+    def parse_offers(self, html: str) -> List[Dict[str, Any]]:
+        """Product offers on a catalog page, using the target's ``parser`` field ('jsonld' or 'none')."""
+        if self.offer_parser == 'none':
+            return []
+        return parse_offers(html)
+
+    def get_offers(self, catalog_url: str) -> List[Dict[str, Any]]:
+        """Fetch a catalog page and extract its product offers."""
+        response = self.http.get(catalog_url, use_cache=True)
+        if response.status_code != 200:
+            logger.debug(f"Catalog page {catalog_url} returned {response.status_code}")
+            return []
+        return self.parse_offers(response.text)
+
+    @property
+    def index_file(self) -> str:
+        return f'data/index-{self.store_name.lower()}.json'
+
+    def update_index_file(self, new_catalogs: List[Catalog]) -> bool:
+        """
+        Merge new catalogs into the store-specific index file.
+
+        Catalogs are keyed by URL. The file is only rewritten (atomically) when
+        its content fingerprint changes, so a run that finds nothing new leaves
+        it untouched. Returns whether the file was written.
+        """
+        index_file = self.index_file
+        if get_storage() == 'sqlite':
+            return self.update_database(index_file, new_catalogs)
         logger.info(f"Updating index file: {index_file}")
-        
-        os.makedirs('data', exist_ok=True)
-        
-        existing_catalogs = []
-        if os.path.exists(index_file):
-            with open(index_file, 'r', encoding='utf-8') as f:
-                try:
-                    data = json.load(f)
-                    for catalog in data:
-                        catalog['valid_from'] = self.parse_date(catalog['valid_from']) if catalog.get('valid_from') else None
-                        catalog['valid_to'] = self.parse_date(catalog['valid_to']) if catalog.get('valid_to') else None
-                        catalog['last_updated'] = datetime.fromisoformat(catalog['last_updated']) if catalog.get('last_updated') else None
-                    existing_catalogs = data
-                    logger.debug(f"Loaded {len(existing_catalogs)} existing catalogs")
-                except json.JSONDecodeError:
-                    logger.error("Error reading existing file, starting fresh")
-        
-        # Create a set of URLs from new catalogs for faster lookup
-        new_urls = {catalog['url'] for catalog in new_catalogs}
-        
-        # Keep only existing catalogs that:
-        # 1. Are not in new catalogs
-        # 2. Have valid dates
-        updated_catalogs = [
-            catalog for catalog in existing_catalogs 
-            if catalog['url'] not in new_urls 
-            and catalog.get('valid_from') 
-            and catalog.get('valid_to')
-        ]
-        
-        # Add all new catalogs (we already filtered them for valid dates)
-        updated_catalogs.extend(new_catalogs)
-        
-        # Sort by valid_from date (newest first)
-        def sort_key(x):
-            valid_from = x.get('valid_from')
-            return valid_from if valid_from is not None else datetime.min
-        
-        updated_catalogs.sort(
-            key=sort_key,
-            reverse=True
-        )
-        
+
+        # Entries without valid dates are dropped while loading
+        existing_catalogs = read_catalogs(index_file, self.store_name)
+        logger.debug(f"Loaded {len(existing_catalogs)} existing catalogs")
+
+        merged = {catalog.url: catalog for catalog in existing_catalogs}
+        for catalog in new_catalogs:
+            current = merged.get(catalog.url)
+            # Re-finding a known catalog keeps its entry, including last_updated
+            if current is not None and current.same_dates(catalog):
+                continue
+            merged[catalog.url] = catalog
+
+        # Newest first
+        updated_catalogs = sorted(merged.values(), key=lambda c: c.valid_from, reverse=True)
+
+        if catalogs_fingerprint(updated_catalogs) == catalogs_fingerprint(existing_catalogs):
+            logger.info(f"No catalog changes, leaving {index_file} untouched")
+            return False
+
         logger.info(f"Writing {len(updated_catalogs)} catalogs to index file")
-        with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump(updated_catalogs, f, cls=DateTimeEncoder, ensure_ascii=False, indent=2)
-    
+        write_catalogs(index_file, updated_catalogs, compact=self.compact_index)
+        return True
+
+    def update_database(self, index_file: str, new_catalogs: List[Catalog]) -> bool:
+        """SQLite variant of update_index_file; the JSON file is re-exported only on change."""
+        db = CatalogDB()
+        if db.count(self.store_name) == 0:
+            db.import_json(self.store_name, index_file)
+
+        changed = db.upsert(self.store_name, [c.to_dict() for c in new_catalogs])
+        if not changed and os.path.exists(index_file):
+            logger.info(f"No catalog changes for {self.store_name}")
+            return False
+
+        logger.info(f"Stored {changed} changed {self.store_name} catalogs")
+        db.export_json(self.store_name, index_file, compact=self.compact_index)
+        return True
+
     @staticmethod
     def parse_date(date_str: str) -> Optional[datetime]:
-        """Parse date string to datetime object."""
-        try:
-            return datetime.strptime(date_str, '%Y.%m.%d')
-        except (ValueError, TypeError):
-            return None
+        """Parse an ISO (or YYYY.MM.DD) date string to a datetime object."""
+        return parse_datetime(date_str)
     
-    def run(self):
-        """Execute the crawler."""
+    def run(self) -> List[Catalog]:
+        """Execute the crawler and return the catalogs it found."""
         try:
             logger.info(f"Starting {self.store_name} catalog crawler")
-            catalogs = self.get_catalog_info()
-            self.update_index_file(catalogs)
-            logger.info("Finished successfully")
+            with metrics.stage('run', profile=True, store=self.store_name):
+                with metrics.stage('get_catalog_info', store=self.store_name):
+                    catalogs = self.get_catalog_info()
+                metrics.gauge('catalogs_found', len(catalogs), store=self.store_name)
+                with metrics.stage('update_index_file', store=self.store_name):
+                    self.update_index_file(catalogs)
+            logger.info(f"{self.store_name} finished successfully")
+            return catalogs
         except Exception as e:
-            logger.error(f"Error: {e}", exc_info=True) 
\ No newline at end of file
+            logger.error(f"{self.store_name} error: {e}", exc_info=True)
+            raise
+ 
\ No newline at end of file
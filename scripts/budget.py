@@ -0,0 +1,42 @@
+import time
+from typing import Callable, Optional
+
+# Kept free at the end of a budgeted run for rendering the pages, but never
+# more than MAX_RESERVE_SHARE of the budget, so a short one still leaves time to crawl
+RENDER_RESERVE = 30.0
+MAX_RESERVE_SHARE = 0.25
+# Share of the remaining budget the crawlers get; the rest goes to images and offers
+CRAWL_SHARE = 0.6
+
+
+class DeadlineExceeded(Exception):
+    """The run's time budget is used up; raised instead of starting more work."""
+
+
+class Budget:
+    """
+    Wall-clock budget for one run. Phases take a share of what is left, so
+    time a fast phase does not use carries over to the next one. Without a
+    total, every method returns None (no limit).
+    """
+
+    def __init__(self, seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.seconds = seconds
+        self.deadline: Optional[float] = clock() + seconds if seconds is not None else None
+        self.reserve = min(RENDER_RESERVE, seconds * MAX_RESERVE_SHARE) if seconds is not None else 0.0
+
+    def remaining(self, reserve: float = 0.0) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - reserve - self.clock(), 0.0)
+
+    def phase(self, share: float = 1.0, reserve: Optional[float] = None) -> Optional[float]:
+        """Seconds for the next phase: ``share`` of what is left after ``reserve`` (the render reserve)."""
+        remaining = self.remaining(self.reserve if reserve is None else reserve)
+        return remaining * share if remaining is not None else None
+
+    def phase_deadline(self, share: float = 1.0, reserve: Optional[float] = None) -> Optional[float]:
+        """Like phase(), as a time.monotonic() deadline."""
+        seconds = self.phase(share, reserve)
+        return self.clock() + seconds if seconds is not None else None
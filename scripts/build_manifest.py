@@ -0,0 +1,63 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from .fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'data/build-manifest.json'
+
+
+def file_hash(path: str) -> Optional[str]:
+    """SHA-256 of a file's content, or None if it does not exist."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def inputs_hash(inputs: Dict[str, Any]) -> str:
+    """Stable hash of a JSON-serializable description of a build step's inputs."""
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class BuildManifest:
+    """
+    Records the input hash each generated output was built from, so
+    unchanged outputs can be skipped on the next run.
+    """
+
+    def __init__(self, path: str = MANIFEST_FILE, force: bool = False):
+        self.path = path
+        self.force = force
+        self.outputs: Dict[str, str] = {}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.outputs = json.load(f).get('outputs', {})
+            except (json.JSONDecodeError, OSError):
+                logger.error("Error reading build manifest, rebuilding everything")
+
+    def is_fresh(self, output: str, digest: str) -> bool:
+        """Whether output exists and was built from inputs with this digest."""
+        if self.force or not os.path.exists(output):
+            return False
+        return self.outputs.get(output) == digest
+
+    def record(self, output: str, digest: str):
+        if self.outputs.get(output) != digest:
+            self.outputs[output] = digest
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        payload = json.dumps({'outputs': self.outputs}, indent=2, sort_keys=True)
+        atomic_write(self.path, payload.encode('utf-8'))
+        self._dirty = False
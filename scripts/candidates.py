@@ -0,0 +1,168 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import product
+import logging
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from .scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Candidate:
+    """A catalog URL that may or may not be published yet."""
+
+    __slots__ = ('url', 'valid_from', 'valid_to', 'key', 'priority')
+
+    def __init__(self, url: str, valid_from: datetime, valid_to: datetime, key: Tuple[Hashable, ...], priority: int):
+        self.url = url
+        self.valid_from = valid_from
+        self.valid_to = valid_to
+        # Candidates sharing a key are alternatives for the same catalog
+        self.key = key
+        # Lower priority wins when several alternatives exist
+        self.priority = priority
+
+    def __repr__(self):
+        return f"Candidate({self.url!r})"
+
+
+def publish_date(now: datetime, week_offset: int, weekday: int) -> datetime:
+    """Midnight of the given weekday (0 = Monday) in the week ``week_offset`` weeks from now."""
+    target_date = now + timedelta(days=7 * week_offset)
+    day = target_date - timedelta(days=target_date.weekday()) + timedelta(days=weekday)
+    return datetime.combine(day.date(), datetime.min.time())
+
+
+def generate_candidates(templates: Sequence[str],
+                        now: datetime,
+                        week_offsets: Sequence[int],
+                        weekdays: Sequence[int],
+                        variants: Optional[Dict[str, Sequence[str]]] = None,
+                        validity_days: int = 6,
+                        valid_to_end_of_day: bool = False) -> List[Candidate]:
+    """
+    Expand URL templates over week offsets, publish weekdays and store variants.
+
+    Templates are ``str.format`` patterns and may use ``year``, ``yy``, ``mm``,
+    ``dd`` and ``week`` (ISO week number) of the publish date, plus one field
+    per variant dimension, e.g. ``{suffix}`` or ``{store_type}``. Variants
+    describe distinct catalogs; weekdays and templates are alternatives for the
+    same catalog, tried in the given order.
+    """
+    variants = variants or {}
+    names = list(variants)
+    end_time = datetime.max.time() if valid_to_end_of_day else datetime.min.time()
+
+    candidates = []
+    for week_offset in week_offsets:
+        for values in product(*(variants[name] for name in names)):
+            fields = dict(zip(names, values))
+            key = (week_offset,) + tuple(values)
+            priority = 0
+            for weekday in weekdays:
+                valid_from = publish_date(now, week_offset, weekday)
+                valid_to = datetime.combine((valid_from + timedelta(days=validity_days)).date(), end_time)
+                date_fields = {
+                    'year': valid_from.year,
+                    'yy': valid_from.year % 100,
+                    'mm': valid_from.month,
+                    'dd': valid_from.day,
+                    'week': valid_from.isocalendar()[1],
+                }
+                for template in templates:
+                    url = template.format(**date_fields, **fields)
+                    candidates.append(Candidate(url, valid_from, valid_to, key, priority))
+                    priority += 1
+    return candidates
+
+
+def probe_candidates(candidates: Sequence[Candidate],
+                     validate: Callable[[str], bool],
+                     max_workers: int = 8,
+                     per_host: int = 4,
+                     scheduler: Optional['Scheduler'] = None,
+                     owner: str = '') -> List[Candidate]:
+    """
+    Validate candidates in parallel and return the winner for every key.
+
+    With a ``scheduler``, probes are queued on it as tasks of ``owner`` and
+    share its global and per-host limits with every other crawler. Otherwise
+    a private pool runs them, with at most ``per_host`` probes against the
+    same host at once. Once a key is resolved, its lower-ranked alternatives
+    that have not started yet are skipped instead of probed.
+
+    A probe whose ``validate`` raises (connection error, timeout, open
+    circuit) counts as unanswered. If no probe got an answer, the first
+    error is raised, preferring one that is not CircuitOpenError, so the
+    caller can tell a store that is down from one with no catalogs.
+    """
+    from .circuit import CircuitOpenError
+
+    if not candidates:
+        return []
+
+    host_limits: Dict[str, threading.Semaphore] = {}
+    for candidate in candidates:
+        host_limits.setdefault(urlsplit(candidate.url).netloc, threading.Semaphore(per_host))
+
+    resolved: Dict[Tuple[Hashable, ...], Candidate] = {}
+    errors: List[Exception] = []
+    answered = 0
+    lock = threading.Lock()
+
+    def is_settled(candidate: Candidate) -> bool:
+        winner = resolved.get(candidate.key)
+        return winner is not None and winner.priority < candidate.priority
+
+    def check(candidate: Candidate) -> bool:
+        nonlocal answered
+        with lock:
+            if is_settled(candidate):
+                logger.debug(f"Skipping {candidate.url}, already resolved")
+                return False
+        try:
+            valid = validate(candidate.url)
+        except Exception as e:
+            logger.debug(f"Probe of {candidate.url} failed: {e}")
+            with lock:
+                errors.append(e)
+            return False
+        with lock:
+            answered += 1
+        if not valid:
+            logger.debug(f"Skipping invalid URL: {candidate.url}")
+            return False
+        return True
+
+    def probe(candidate: Candidate):
+        if scheduler is None:
+            with host_limits[urlsplit(candidate.url).netloc]:
+                valid = check(candidate)
+        else:
+            valid = check(candidate)
+        if valid:
+            with lock:
+                if not is_settled(candidate):
+                    resolved[candidate.key] = candidate
+
+    ordered = sorted(candidates, key=lambda c: c.priority)
+    if scheduler is not None:
+        for future in [scheduler.submit(owner, urlsplit(c.url).netloc, probe, c) for c in ordered]:
+            future.result()
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(candidates))) as executor:
+            for future in [executor.submit(probe, c) for c in ordered]:
+                future.result()
+
+    if errors and not answered:
+        raise next((e for e in errors if not isinstance(e, CircuitOpenError)), errors[0])
+    if errors:
+        logger.warning(f"{len(errors)} of {len(errors) + answered} probes failed, e.g. {errors[0]}")
+
+    # Keep the generator's order in the output
+    winners = set(map(id, resolved.values()))
+    return [c for c in candidates if id(c) in winners]
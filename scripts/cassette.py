@@ -0,0 +1,176 @@
+"""
+Record and replay the HTTP traffic of a run.
+
+A cassette is a gzipped JSON file with every request HttpClient sent and
+what came back: status, headers, body and how long it took, or the
+connection error it raised. Recording wraps the live transport; replaying
+loads the whole cassette into memory and answers every request from it
+without touching the network, so a full crawl runs in milliseconds and
+gives the same result every time.
+
+Interactions are keyed by method and URL (before AKCIOS_HOST_MAP
+rewriting). Repeated requests to the same URL get their recorded responses
+in order, and the last one again once those run out. The moment the
+recording was made is stored too, so a replay can freeze time to it.
+"""
+from datetime import datetime
+import base64
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from . import clock
+from .fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+# Errors raised again on replay; anything else becomes a ConnectionError
+_ERRORS = {
+    'ConnectTimeout': requests.ConnectTimeout,
+    'ReadTimeout': requests.ReadTimeout,
+    'Timeout': requests.Timeout,
+    'ConnectionError': requests.ConnectionError,
+}
+
+
+class CassetteMiss(Exception):
+    """A replayed run sent a request the cassette has no recording of."""
+
+
+def _key(method: str, url: str) -> str:
+    return f'{method} {url}'
+
+
+def _encode_body(body: bytes) -> Dict[str, str]:
+    try:
+        return {'text': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(body).decode('ascii')}
+
+
+def _decode_body(entry: Dict[str, Any]) -> bytes:
+    if 'base64' in entry:
+        return base64.b64decode(entry['base64'])
+    return entry.get('text', '').encode('utf-8')
+
+
+class Cassette:
+    """
+    Recorded interactions of one run, in ``mode`` 'record' or 'replay'.
+    With ``latency`` on replay, each response is delayed by the time it
+    originally took, for timing runs that should behave like the live one.
+    """
+
+    def __init__(self, path: str, mode: str, latency: bool = False):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.recorded_at: Optional[datetime] = None
+        self.interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self.stats = {'recorded': 0, 'replayed': 0, 'missed': 0}
+        self._served: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            self.load()
+        else:
+            self.recorded_at = clock.now()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == 'record'
+
+    def load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette {self.path} does not exist; record one with --record")
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Cassette {self.path} has version {data.get('version')}, expected {CASSETTE_VERSION}")
+        self.recorded_at = datetime.fromisoformat(data['recorded_at'])
+        for entry in data['interactions']:
+            self.interactions.setdefault(_key(entry['method'], entry['url']), []).append(entry)
+        logger.info(f"Loaded {len(data['interactions'])} interactions from {self.path}, "
+                    f"recorded at {self.recorded_at.isoformat(timespec='seconds')}")
+
+    def save(self):
+        if not self.recording:
+            return
+        with self._lock:
+            entries = [entry for key in sorted(self.interactions) for entry in self.interactions[key]]
+        data = {
+            'version': CASSETTE_VERSION,
+            'recorded_at': self.recorded_at.isoformat(),
+            'interactions': entries,
+        }
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        atomic_write(self.path, gzip.compress(payload, compresslevel=9, mtime=0))
+        logger.info(f"Recorded {len(entries)} interactions to {self.path} ({os.path.getsize(self.path)} bytes)")
+
+    def send(self, method: str, url: str, live: Callable[[], Any]):
+        """Response for a request: from the cassette, or from ``live()`` while recording it."""
+        if self.recording:
+            return self._record(method, url, live)
+        return self._replay(method, url)
+
+    def _add(self, entry: Dict[str, Any]):
+        with self._lock:
+            self.interactions.setdefault(_key(entry['method'], entry['url']), []).append(entry)
+            self.stats['recorded'] += 1
+
+    def _record(self, method: str, url: str, live: Callable[[], Any]):
+        from .http_client import HttpResponse
+
+        start = time.perf_counter()
+        entry: Dict[str, Any] = {'method': method, 'url': url}
+        try:
+            response = live()
+        except Exception as e:
+            entry.update(error=type(e).__name__, message=str(e), elapsed=round(time.perf_counter() - start, 4))
+            self._add(entry)
+            raise
+        # Streams are read in full so the body can be stored; fine for a recording run
+        try:
+            body = response.content
+        finally:
+            response.close()
+        entry.update(status=response.status_code, headers=dict(response.headers),
+                     elapsed=round(time.perf_counter() - start, 4), **_encode_body(body))
+        self._add(entry)
+        return HttpResponse(url, response.status_code, dict(response.headers), content=body)
+
+    def _replay(self, method: str, url: str):
+        from .http_client import HttpResponse
+
+        key = _key(method, url)
+        with self._lock:
+            entries = self.interactions.get(key)
+            if not entries:
+                self.stats['missed'] += 1
+            else:
+                position = self._served.get(key, 0)
+                self._served[key] = position + 1
+                entry = entries[min(position, len(entries) - 1)]
+                self.stats['replayed'] += 1
+        if not entries:
+            logger.warning(f"Not in cassette: {key}")
+            raise CassetteMiss(f"No recording of {key} in {self.path}")
+
+        if self.latency:
+            time.sleep(entry.get('elapsed', 0))
+        if 'error' in entry:
+            raise _ERRORS.get(entry['error'], requests.ConnectionError)(entry['message'])
+        return HttpResponse(url, entry['status'], dict(entry['headers']), content=_decode_body(entry))
+
+    def summary(self) -> str:
+        if self.recording:
+            return f"{self.stats['recorded']} interactions recorded"
+        return f"{self.stats['replayed']} replayed, {self.stats['missed']} missing"
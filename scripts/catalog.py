@@ -0,0 +1,74 @@
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Union
+
+DateLike = Union[str, datetime, date, None]
+
+
+def parse_datetime(value: DateLike) -> Optional[datetime]:
+    """Parse an ISO date/datetime string (or the older YYYY.MM.DD form); None if it is not one."""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        pass
+    try:
+        return datetime.strptime(value, '%Y.%m.%d')
+    except (ValueError, TypeError):
+        return None
+
+
+class Catalog:
+    """
+    One store catalog with its validity range.
+
+    Dates are parsed once, when the record is created; crawlers, the index
+    files, the binary snapshot and the generator all pass these records around.
+    """
+
+    __slots__ = ('url', 'valid_from', 'valid_to', 'last_updated', 'store')
+
+    def __init__(self, url: str, valid_from: datetime, valid_to: datetime,
+                 last_updated: Optional[datetime] = None, store: Optional[str] = None):
+        self.url = url
+        self.valid_from = valid_from
+        self.valid_to = valid_to
+        self.last_updated = last_updated
+        self.store = store
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], store: Optional[str] = None) -> Optional['Catalog']:
+        """Record for an index file entry, or None if it lacks a URL or valid dates."""
+        valid_from = parse_datetime(data.get('valid_from'))
+        valid_to = parse_datetime(data.get('valid_to'))
+        if not data.get('url') or valid_from is None or valid_to is None:
+            return None
+        return cls(data['url'], valid_from, valid_to,
+                   parse_datetime(data.get('last_updated')), store or data.get('store'))
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """Entry in the index-<store>.json format."""
+        return {
+            'url': self.url,
+            'valid_from': self.valid_from.isoformat(),
+            'valid_to': self.valid_to.isoformat(),
+            'last_updated': self.last_updated.isoformat() if self.last_updated else None,
+        }
+
+    def same_dates(self, other: 'Catalog') -> bool:
+        """Whether two records describe the same catalog, ignoring last_updated."""
+        return (self.url, self.valid_from, self.valid_to) == (other.url, other.valid_from, other.valid_to)
+
+    def is_valid_on(self, day: date) -> bool:
+        return self.valid_from.date() <= day <= self.valid_to.date()
+
+    def __eq__(self, other):
+        if not isinstance(other, Catalog):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return (f"Catalog({self.store or ''} {self.url} "
+                f"{self.valid_from:%Y-%m-%d}..{self.valid_to:%Y-%m-%d})")
@@ -0,0 +1,142 @@
+from contextlib import closing
+from datetime import date, datetime
+import logging
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional
+
+from .index_store import load_index, write_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = 'data/catalogs.sqlite3'
+
+# Storage backends for catalog data: plain JSON files or SQLite
+STORAGE_BACKENDS = ('json', 'sqlite')
+
+_storage = os.environ.get('AKCIOS_STORAGE', 'json')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalogs (
+    store TEXT NOT NULL,
+    url TEXT NOT NULL,
+    valid_from TEXT NOT NULL,
+    valid_to TEXT NOT NULL,
+    last_updated TEXT,
+    PRIMARY KEY (store, url)
+);
+CREATE INDEX IF NOT EXISTS idx_catalogs_valid_from ON catalogs (valid_from);
+CREATE INDEX IF NOT EXISTS idx_catalogs_valid_to ON catalogs (valid_to);
+CREATE INDEX IF NOT EXISTS idx_catalogs_store ON catalogs (store, valid_from);
+"""
+
+# Only real data changes rewrite a row; re-finding a catalog keeps last_updated
+UPSERT = """
+INSERT INTO catalogs (store, url, valid_from, valid_to, last_updated)
+VALUES (:store, :url, :valid_from, :valid_to, :last_updated)
+ON CONFLICT (store, url) DO UPDATE SET
+    valid_from = excluded.valid_from,
+    valid_to = excluded.valid_to,
+    last_updated = excluded.last_updated
+WHERE catalogs.valid_from IS NOT excluded.valid_from
+   OR catalogs.valid_to IS NOT excluded.valid_to
+"""
+
+COLUMNS = ('url', 'valid_from', 'valid_to', 'last_updated')
+
+
+def get_storage() -> str:
+    return _storage
+
+
+def set_storage(backend: str):
+    """Select the catalog storage backend for this process."""
+    global _storage
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    _storage = backend
+
+
+def _iso(value: Any) -> Optional[str]:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class CatalogDB:
+    """SQLite catalog store keyed by (store, url) with indexed date range queries."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per operation keeps concurrent crawler threads independent
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def upsert(self, store: str, catalogs: Iterable[Dict[str, Any]]) -> int:
+        """Insert or update catalogs for a store; returns the number of rows changed."""
+        rows = [
+            {
+                'store': store,
+                'url': catalog['url'],
+                'valid_from': _iso(catalog['valid_from']),
+                'valid_to': _iso(catalog['valid_to']),
+                'last_updated': _iso(catalog.get('last_updated')),
+            }
+            for catalog in catalogs
+            if catalog.get('valid_from') and catalog.get('valid_to')
+        ]
+        with closing(self._connect()) as conn, conn:
+            before = conn.total_changes
+            conn.executemany(UPSERT, rows)
+            return conn.total_changes - before
+
+    def count(self, store: Optional[str] = None) -> int:
+        with closing(self._connect()) as conn:
+            if store is None:
+                return conn.execute('SELECT COUNT(*) FROM catalogs').fetchone()[0]
+            return conn.execute('SELECT COUNT(*) FROM catalogs WHERE store = ?', (store,)).fetchone()[0]
+
+    def _query(self, where: str, params: List[Any], stores: Optional[List[str]]) -> List[Dict[str, Any]]:
+        if stores:
+            where += f" AND store IN ({','.join('?' * len(stores))})"
+            params = params + list(stores)
+        sql = f"SELECT store, {', '.join(COLUMNS)} FROM catalogs WHERE {where} ORDER BY valid_from DESC, url"
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def catalogs(self, store: str) -> List[Dict[str, Any]]:
+        """All catalogs of a store, newest first."""
+        return self._query('store = ?', [store], None)
+
+    def valid_on(self, day: date, stores: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Catalogs whose validity range contains the given day."""
+        start = datetime.combine(day, datetime.min.time()).isoformat()
+        end = datetime.combine(day, datetime.max.time()).isoformat()
+        return self._query('valid_from <= ? AND valid_to >= ?', [end, start], stores)
+
+    def valid_since(self, day: date, stores: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Catalogs still valid on or after the given day."""
+        start = datetime.combine(day, datetime.min.time()).isoformat()
+        return self._query('valid_to >= ?', [start], stores)
+
+    def import_json(self, store: str, index_file: str) -> int:
+        """Load an existing index-<store>.json file into the database."""
+        catalogs = load_index(index_file)
+        if not catalogs:
+            return 0
+        imported = self.upsert(store, catalogs)
+        logger.info(f"Imported {imported} {store} catalogs from {index_file}")
+        return imported
+
+    def export_json(self, store: str, index_file: str, compact: bool = False):
+        """Write the store's catalogs in the index-<store>.json format for backward compatibility."""
+        catalogs = [{k: row[k] for k in COLUMNS} for row in self.catalogs(store)]
+        write_index(index_file, catalogs, compact=compact)
+        logger.info(f"Exported {len(catalogs)} {store} catalogs to {index_file}")
@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable
+
+from .fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'data/circuit-breakers.json'
+
+# Consecutive failed requests after which a host's circuit opens
+FAILURE_THRESHOLD = 3
+# How long an open circuit skips the host; doubles every time a retry fails
+COOLDOWN = 15 * 60
+MAX_COOLDOWN = 6 * 3600
+
+
+class CircuitOpenError(Exception):
+    """A request was refused because its host is known to be failing."""
+
+
+class CircuitBreakers:
+    """
+    Per-host circuit breakers, persisted across runs.
+
+    A host whose requests fail ``failure_threshold`` times in a row (after
+    HttpClient's retries) is skipped for ``cooldown`` seconds, so a retailer
+    that is down does not cost its timeouts on every run. When the cooldown
+    is over, requests go through again: one success closes the circuit, a
+    failure reopens it with twice the cooldown, up to ``max_cooldown``.
+    """
+
+    def __init__(self, path: str = STATE_FILE, failure_threshold: int = FAILURE_THRESHOLD,
+                 cooldown: float = COOLDOWN, max_cooldown: float = MAX_COOLDOWN,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        # host -> {'failures', 'open_until', 'cooldown', 'last_error'}
+        self.hosts: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.hosts = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            logger.error(f"Error reading {self.path}, starting with closed circuits")
+            self.hosts = {}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self.hosts, indent=2, sort_keys=True)
+            self._dirty = False
+        atomic_write(self.path, data.encode('utf-8'))
+
+    def is_open(self, host: str) -> bool:
+        state = self.hosts.get(host)
+        return state is not None and state.get('open_until', 0) > self.clock()
+
+    def all_open(self, hosts: Iterable[str]) -> bool:
+        hosts = list(hosts)
+        return bool(hosts) and all(self.is_open(host) for host in hosts)
+
+    def record_success(self, host: str):
+        with self._lock:
+            if host in self.hosts:
+                logger.info(f"Circuit for {host} closed")
+                del self.hosts[host]
+                self._dirty = True
+
+    def record_failure(self, host: str, error: str):
+        with self._lock:
+            state = self.hosts.setdefault(host, {'failures': 0, 'open_until': 0, 'cooldown': 0})
+            if state['open_until'] > self.clock():
+                # A request that was already in flight when the circuit opened
+                return
+            state['failures'] += 1
+            state['last_error'] = error[:200]
+            self._dirty = True
+            # After a cooldown, one failure means the host is still down: wait longer
+            threshold = 1 if state['cooldown'] else self.failure_threshold
+            if state['failures'] < threshold:
+                return
+            cooldown = min(state['cooldown'] * 2, self.max_cooldown) if state['cooldown'] else self.cooldown
+            state['cooldown'] = cooldown
+            state['open_until'] = self.clock() + cooldown
+            state['failures'] = 0
+        logger.warning(f"Circuit for {host} opened for {cooldown / 60:.0f} min: {error}")
+
+    def summary(self) -> str:
+        open_hosts = [host for host in self.hosts if self.is_open(host)]
+        return f"{len(open_hosts)} open ({', '.join(open_hosts) or 'none'})"
@@ -0,0 +1,26 @@
+from datetime import datetime
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Crawl windows, "this week" and page footers all depend on the current time.
+# Freezing it makes a run reproducible, e.g. when replaying a cassette.
+_frozen: Optional[datetime] = None
+
+
+def now() -> datetime:
+    """The current local time, or the frozen moment if one is set."""
+    return _frozen if _frozen is not None else datetime.now()
+
+
+def is_frozen() -> bool:
+    return _frozen is not None
+
+
+def freeze_time(moment: Optional[datetime]):
+    """Make now() return ``moment`` until unfrozen with None."""
+    global _frozen
+    _frozen = moment
+    if moment is not None:
+        logger.info(f"Time frozen at {moment.isoformat(timespec='seconds')}")
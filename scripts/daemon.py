@@ -0,0 +1,366 @@
+"""
+Long-running crawl loop that polls each store around its usual release time.
+
+Every store gets a ReleaseModel: a distribution over the 168 hours of the
+week of when its new catalogs appear. It is learned from the catalogs in
+data/index-*.json, where ``last_updated`` records the first sighting, and
+refined by the exact detection times the daemon itself records in
+data/daemon-state.json. The configured publish weekdays act as a prior, so a
+store without history is still polled around its publish day.
+
+The hours that hold most of the probability mass are the store's release
+windows. Inside a window the store is polled every ``min_interval``; outside
+it, every ``max_interval``, but never past the start of the next window. Once
+a window has produced the usual number of new catalogs, the rest of it is
+skipped.
+"""
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import signal
+import statistics
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Set
+
+from .catalog import Catalog, parse_datetime
+from .fileio import atomic_write
+from .index_store import read_catalogs
+from .metrics import metrics
+from .runner import DEFAULT_STORE_TIMEOUT, CrawlResult, run_crawlers
+
+if TYPE_CHECKING:
+    from .base_crawler import BaseCrawler
+    from .http_cache import HttpCache
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'data/daemon-state.json'
+SLOTS = 7 * 24
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+DEFAULT_MIN_INTERVAL = 10 * 60
+DEFAULT_MAX_INTERVAL = 6 * 3600
+# Share of the release probability the windows cover
+DEFAULT_COVERAGE = 0.8
+
+# Index history comes from the daily scheduled run: a catalog first seen at
+# 06:00 was published at some point during the 24 hours before
+HISTORY_RESOLUTION = timedelta(hours=24)
+# Observations lose half their weight every this many weeks
+HALF_LIFE_WEEKS = 8
+# Weight of the publish weekday prior, in observations
+PRIOR_WEIGHT = 2.0
+# Keeps every hour possible, so no slot is ruled out for good
+FLOOR_WEIGHT = 0.001
+# Windows closer than this are treated as one release window
+RELEASE_GAP = timedelta(hours=18)
+# Detection records kept per store
+MAX_DETECTIONS = 200
+
+
+def slot_of(moment: datetime) -> int:
+    """Hour of the week, 0 = Monday 00:00-01:00."""
+    return moment.weekday() * 24 + moment.hour
+
+
+def _spread(weights: List[float], start: datetime, end: datetime, mass: float):
+    """Add mass to the hourly slots of [start, end], proportionally to the time spent in each."""
+    if end <= start:
+        weights[slot_of(end)] += mass
+        return
+    start = max(start, end - timedelta(days=7))
+    total = (end - start).total_seconds()
+    moment = start
+    while moment < end:
+        step_end = min(moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1), end)
+        weights[slot_of(moment)] += mass * (step_end - moment).total_seconds() / total
+        moment = step_end
+
+
+def describe_slots(slots: Set[int]) -> str:
+    """'Wed 18:00-Thu 10:00, Fri 06:00-08:00' for a set of hour-of-week slots."""
+    if not slots:
+        return 'none'
+    if len(slots) == SLOTS:
+        return 'always'
+    # Start each range at a slot whose predecessor is not in the set, so ranges can wrap Sunday
+    starts = sorted(s for s in slots if (s - 1) % SLOTS not in slots)
+    ranges = []
+    for start in starts:
+        end = start
+        while (end + 1) % SLOTS in slots:
+            end = (end + 1) % SLOTS
+        after = (end + 1) % SLOTS
+        ranges.append(f"{DAY_NAMES[start // 24]} {start % 24:02d}:00-{DAY_NAMES[after // 24]} {after % 24:02d}:00")
+    return ', '.join(ranges)
+
+
+class ReleaseModel:
+    """How likely a store is to publish a new catalog in each hour of the week."""
+
+    def __init__(self, weights: List[float], observations: int, per_release: int):
+        self.weights = weights
+        self.observations = observations
+        # New catalogs that usually appear together, e.g. the hyper- and supermarket editions
+        self.per_release = per_release
+
+    @classmethod
+    def learn(cls, catalogs: Sequence[Catalog], publish_weekdays: Sequence[int],
+              detections: Sequence[Dict[str, str]] = (), now: Optional[datetime] = None) -> 'ReleaseModel':
+        now = now or datetime.now()
+        weights = [FLOOR_WEIGHT] * SLOTS
+
+        # Prior: mostly the publish day itself, sometimes the day before it
+        share = PRIOR_WEIGHT / len(publish_weekdays)
+        for weekday in publish_weekdays:
+            day = datetime(2024, 1, 1) + timedelta(days=weekday)  # a Monday, plus weekday
+            _spread(weights, day - timedelta(days=1), day, share / 3)
+            _spread(weights, day, day + timedelta(days=1), share * 2 / 3)
+
+        detected = {d['url']: d for d in detections}
+        observations = 0
+        for catalog in catalogs:
+            detection = detected.get(catalog.url)
+            if detection is not None:
+                start, end = parse_datetime(detection['after']), parse_datetime(detection['at'])
+            else:
+                end = catalog.last_updated or catalog.valid_from
+                # A catalog found long after it became valid was backfilled, not just published
+                end = min(end, catalog.valid_from + timedelta(days=1))
+                start = end - HISTORY_RESOLUTION
+            if start is None or end is None:
+                continue
+            age_weeks = max((now - end).days, 0) / 7
+            _spread(weights, start, end, 0.5 ** (age_weeks / HALF_LIFE_WEEKS))
+            observations += 1
+
+        per_date: Dict[datetime, int] = {}
+        for catalog in catalogs:
+            per_date[catalog.valid_from] = per_date.get(catalog.valid_from, 0) + 1
+        per_release = max(1, round(statistics.median(per_date.values()))) if per_date else 1
+        return cls(weights, observations, per_release)
+
+    def windows(self, coverage: float = DEFAULT_COVERAGE) -> Set[int]:
+        """The fewest hours of the week that together hold ``coverage`` of the probability."""
+        total = sum(self.weights)
+        hot: Set[int] = set()
+        mass = 0.0
+        # On ties, later hours first: they are closer to the publish day
+        for slot in sorted(range(SLOTS), key=lambda s: (self.weights[s], s), reverse=True):
+            if mass >= coverage * total:
+                break
+            hot.add(slot)
+            mass += self.weights[slot]
+        return hot
+
+
+class PollPlanner:
+    """Decides when a store is polled next, from its release windows."""
+
+    def __init__(self, model: ReleaseModel, min_interval: float = DEFAULT_MIN_INTERVAL,
+                 max_interval: float = DEFAULT_MAX_INTERVAL, coverage: float = DEFAULT_COVERAGE):
+        self.model = model
+        self.windows = model.windows(coverage)
+        self.min_interval = timedelta(seconds=min_interval)
+        self.max_interval = timedelta(seconds=max_interval)
+        # New catalogs found in the window that closes at found_window_end
+        self.found = 0
+        self.found_window_end: Optional[datetime] = None
+        # End of a window that already produced its catalogs
+        self.quiet_until: Optional[datetime] = None
+
+    def in_window(self, moment: datetime) -> bool:
+        return slot_of(moment) in self.windows
+
+    def _next_hour(self, moment: datetime) -> datetime:
+        return moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+    def window_end(self, moment: datetime) -> datetime:
+        """End of the window around moment; windows less than RELEASE_GAP apart belong to one release."""
+        end = moment = self._next_hour(moment)
+        for _ in range(SLOTS):
+            if self.in_window(moment):
+                end = moment = moment + timedelta(hours=1)
+            elif moment - end < RELEASE_GAP:
+                moment += timedelta(hours=1)
+            else:
+                break
+        return end
+
+    def next_window(self, moment: datetime) -> Optional[datetime]:
+        """Start of the first window hour after moment."""
+        start = self._next_hour(moment)
+        for _ in range(SLOTS):
+            if self.in_window(start):
+                return start
+            start += timedelta(hours=1)
+        return None
+
+    def record(self, now: datetime, new_catalogs: int):
+        """Account for a poll that found new_catalogs catalogs."""
+        if not new_catalogs or not self.in_window(now):
+            return
+        end = self.window_end(now)
+        if end != self.found_window_end:
+            self.found, self.found_window_end = 0, end
+        self.found += new_catalogs
+        if self.found >= self.model.per_release:
+            self.quiet_until = end
+
+    def next_poll(self, now: datetime) -> datetime:
+        quiet = self.quiet_until is not None and now < self.quiet_until
+        if self.in_window(now) and not quiet:
+            return now + self.min_interval
+        start = self.next_window(self.quiet_until - timedelta(seconds=1) if quiet else now)
+        backoff = now + self.max_interval
+        return min(start, backoff) if start is not None else backoff
+
+
+class Daemon:
+    """
+    Polls the crawlers on their planned schedule until stopped.
+
+    The HTTP client, scheduler and crawlers stay alive between polls, so
+    connections stay warm, and the known catalog URLs of each store are kept
+    in memory: a poll that finds nothing new writes and renders nothing.
+    """
+
+    def __init__(self, crawlers: List['BaseCrawler'],
+                 after_crawl: Callable[[List['BaseCrawler'], List[CrawlResult]], None],
+                 render: Callable[[], None],
+                 min_interval: float = DEFAULT_MIN_INTERVAL,
+                 max_interval: float = DEFAULT_MAX_INTERVAL,
+                 coverage: float = DEFAULT_COVERAGE,
+                 timeout: float = DEFAULT_STORE_TIMEOUT,
+                 cache: Optional['HttpCache'] = None,
+                 state_file: str = STATE_FILE):
+        self.crawlers = crawlers
+        self.after_crawl = after_crawl
+        self.render = render
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.coverage = coverage
+        self.timeout = timeout
+        self.cache = cache
+        self.state_file = state_file
+        self.stop = threading.Event()
+
+        self.detections: Dict[str, List[Dict[str, str]]] = self._load_state()
+        self.known: Dict[str, Set[str]] = {}
+        self.planners: Dict[str, PollPlanner] = {}
+        self.last_poll: Dict[str, datetime] = {}
+        now = datetime.now()
+        # Poll everything once at startup: catalogs may have appeared while stopped
+        self.next_poll: Dict[str, datetime] = {c.store_name: now for c in crawlers}
+        for crawler in crawlers:
+            catalogs = read_catalogs(crawler.index_file, crawler.store_name)
+            self.known[crawler.store_name] = {c.url for c in catalogs}
+            self.planners[crawler.store_name] = self._plan(crawler, catalogs)
+
+    def _load_state(self) -> Dict[str, List[Dict[str, str]]]:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('detections', {})
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Ignoring unreadable {self.state_file}: {e}")
+            return {}
+
+    def _save_state(self):
+        payload = json.dumps({'detections': self.detections}, indent=2, ensure_ascii=False)
+        atomic_write(self.state_file, payload.encode('utf-8'))
+
+    def _plan(self, crawler: 'BaseCrawler', catalogs: Sequence[Catalog]) -> PollPlanner:
+        model = ReleaseModel.learn(catalogs, crawler.publish_weekdays, self.detections.get(crawler.store_name, ()))
+        planner = PollPlanner(model, self.min_interval, self.max_interval, self.coverage)
+        logger.info(f"{crawler.store_name}: {model.observations} releases seen, "
+                    f"windows {describe_slots(planner.windows)}")
+        return planner
+
+    def plan(self) -> Dict[str, Dict[str, object]]:
+        """Release windows and next poll per store, without polling."""
+        return {
+            store: {
+                'observations': planner.model.observations,
+                'per_release': planner.model.per_release,
+                'windows': describe_slots(planner.windows),
+                'next_poll': planner.next_poll(datetime.now()).isoformat(timespec='minutes'),
+            }
+            for store, planner in self.planners.items()
+        }
+
+    def poll(self, crawlers: List['BaseCrawler']) -> List[str]:
+        """Crawl the given stores once; returns the stores that found new catalogs."""
+        from .http_client import get_http_client
+
+        results = run_crawlers(crawlers, timeout=self.timeout, breakers=get_http_client().breakers)
+        now = datetime.now()
+        changed = []
+        for crawler, result in zip(crawlers, results):
+            store = crawler.store_name
+            metrics.count('daemon_polls_total', store=store, status=result.status)
+            new = [c for c in result.found if c.url not in self.known[store]] if result.status == 'ok' else []
+            # Without an earlier poll there is no telling when these were published
+            after = self.last_poll.get(store)
+            if new:
+                logger.info(f"{store}: {len(new)} new catalogs")
+                metrics.count('daemon_detections_total', len(new), store=store)
+                self.known[store].update(c.url for c in new)
+                changed.append(store)
+            if new and after is not None:
+                detections = self.detections.setdefault(store, [])
+                detections += [{'url': c.url, 'after': after.isoformat(), 'at': now.isoformat()} for c in new]
+                del detections[:-MAX_DETECTIONS]
+                # Relearn with the new observation, keeping what the window already produced
+                previous = self.planners[store]
+                planner = self._plan(crawler, read_catalogs(crawler.index_file, store))
+                planner.found, planner.found_window_end = previous.found, previous.found_window_end
+                planner.quiet_until = previous.quiet_until
+                planner.record(now, len(new))
+                self.planners[store] = planner
+            if result.status == 'ok':
+                self.last_poll[store] = now
+            self.next_poll[store] = self.planners[store].next_poll(now)
+            logger.info(f"{store}: next poll at {self.next_poll[store]:%a %H:%M}")
+
+        if changed:
+            self._save_state()
+            self.after_crawl([c for c in crawlers if c.store_name in changed],
+                             [r for r in results if r.store_name in changed])
+        if self.cache is not None:
+            self.cache.save()
+        return changed
+
+    def _handle_signal(self, signum, frame):
+        logger.info(f"Received signal {signum}, stopping after the current poll")
+        self.stop.set()
+
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._handle_signal)
+            signal.signal(signal.SIGINT, self._handle_signal)
+
+        rendered_on = None
+        while not self.stop.is_set():
+            now = datetime.now()
+            due = [c for c in self.crawlers if self.next_poll[c.store_name] <= now]
+            changed = self.poll(due) if due else []
+
+            # Pages depend on the date too (current vs upcoming), so render at least daily
+            today = datetime.now().date()
+            if changed or rendered_on != today:
+                try:
+                    self.render()
+                    rendered_on = today
+                except Exception as e:
+                    logger.error(f"Render failed: {e}", exc_info=True)
+            metrics.write(extra={'command': 'daemon', 'next_poll': {
+                store: moment.isoformat(timespec='minutes') for store, moment in self.next_poll.items()}})
+
+            wake = min(self.next_poll.values())
+            midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+            delay = (min(wake, midnight) - datetime.now()).total_seconds()
+            self.stop.wait(max(delay, 1))
+        logger.info("Daemon stopped")
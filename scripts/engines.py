@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from . import clock
+from .base_crawler import BaseCrawler, logger
+from .catalog import Catalog
+from .links import MAX_PAGE_BYTES, find_catalog_links, iter_catalog_links
+from .targets import Target
+
+
+class TemplateCrawler(BaseCrawler):
+    """Stores that publish catalogs on predictable URLs: probe the expanded url_templates."""
+
+    def __init__(self, target: Target, **kwargs):
+        self.target = target
+        self.url_templates = tuple(target.get('templates'))
+        self.url_variants = {name: tuple(values) for name, values in target.get('variants', {}).items()}
+        self.week_offsets = tuple(target.get('week_offsets', self.week_offsets))
+        self.publish_weekdays = tuple(target.get('publish_weekdays', self.publish_weekdays))
+        self.validity_days = target.get('validity_days', self.validity_days)
+        self.valid_to_end_of_day = target.get('valid_to_end_of_day', self.valid_to_end_of_day)
+        self.follow_redirects = target.get('follow_redirects', self.follow_redirects)
+        self.validation = target.get('validation', self.validation)
+        self.validate_candidates = self.validation != 'none'
+        self.offer_parser = target.get('parser', self.offer_parser)
+        super().__init__(target.name, **kwargs)
+
+        probe_per_host = target.get('probe_per_host')
+        if probe_per_host:
+            self.probe_per_host = probe_per_host
+            for template in self.url_templates:
+                self.scheduler.limit_host(urlsplit(template).netloc, probe_per_host)
+
+
+class LinkListingCrawler(BaseCrawler):
+    """
+    Stores that list their catalogs on one page: collect the links whose title
+    starts with link_title_prefix and read the publish date from each URL
+    with date_pattern.
+    """
+
+    def __init__(self, target: Target, **kwargs):
+        self.target = target
+        self.listing_url: str = target.get('listing_url')
+        self.title_prefix: str = target.get('link_title_prefix')
+        self.date_pattern = re.compile(target.get('date_pattern'))
+        self.validity_days = target.get('validity_days', self.validity_days)
+        self.valid_to_end_of_day = target.get('valid_to_end_of_day', self.valid_to_end_of_day)
+        # Not probed, but tells the daemon when new catalogs are likely
+        self.publish_weekdays = tuple(target.get('publish_weekdays', self.publish_weekdays))
+        self.offer_parser = target.get('parser', self.offer_parser)
+        super().__init__(target.name, **kwargs)
+
+    @property
+    def hosts(self) -> Set[str]:
+        return {urlsplit(self.listing_url).netloc}
+
+    def extract_dates_from_url(self, url: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Publish date from a URL like 'online_akcios_ujsag_2025_01_02_kw01', plus validity_days."""
+        match = self.date_pattern.search(url)
+        if match:
+            try:
+                start_date = datetime(int(match['year']), int(match['month']), int(match['day']))
+            except ValueError:
+                return None, None
+            # timedelta carries over month and year ends
+            end_date = (start_date + timedelta(days=self.validity_days)).date()
+            end_time = datetime.max.time() if self.valid_to_end_of_day else datetime.min.time()
+            return start_date, datetime.combine(end_date, end_time)
+        return None, None
+
+    def iter_links(self) -> Iterator[str]:
+        """Stream the listing page and yield catalog links; fall back to BeautifulSoup if none are found."""
+        url = self.listing_url
+        logger.info(f"Fetching URL: {url}")
+        found = False
+        for href in iter_catalog_links(self.http.iter_content(url, use_cache=True, max_bytes=MAX_PAGE_BYTES),
+                                       self.title_prefix):
+            found = True
+            yield href
+
+        if not found:
+            logger.info("Streaming extractor found no links, falling back to BeautifulSoup")
+            response = self.http.get(url, use_cache=True)
+            response.raise_for_status()
+            yield from find_catalog_links(response.text, self.title_prefix)
+
+    def get_catalog_info(self) -> List[Catalog]:
+        # The listing fetch runs on the shared scheduler like every other request
+        links = self.scheduler.submit(self.store_name, urlsplit(self.listing_url).netloc,
+                                      lambda: list(self.iter_links())).result()
+        catalogs = []
+        found_at = clock.now()
+        seen_urls = set()
+
+        for url in links:
+            if url in seen_urls:
+                logger.debug(f"Skipping duplicate URL: {url}")
+                continue
+
+            seen_urls.add(url)
+            logger.debug(f"\nProcessing link: {url}")
+
+            valid_from, valid_to = self.extract_dates_from_url(url)
+
+            if not valid_from or not valid_to:
+                logger.debug(f"Skipping entry without valid dates: {url}")
+                continue
+
+            catalog = Catalog(url, valid_from, valid_to, found_at, self.store_name)
+
+            logger.debug(f"Created catalog entry: {catalog}")
+            catalogs.append(catalog)
+
+        logger.info(f"Found {len(links)} catalog links")
+        logger.info(f"Found {len(catalogs)} unique catalogs with valid dates")
+        return catalogs
+
+
+ENGINES: Dict[str, Callable[..., BaseCrawler]] = {
+    'templates': TemplateCrawler,
+    'link_listing': LinkListingCrawler,
+}
+
+
+def create_crawler(target: Target, **options) -> BaseCrawler:
+    """A crawler for target; options are passed on to BaseCrawler (http, week_offsets, ...)."""
+    return ENGINES[target.engine](target, **options)
@@ -1,167 +1,375 @@
-from datetime import datetime, timedelta
-import json
+from datetime import date, datetime, timedelta
+from html import escape
+import os
 from pathlib import Path
-from typing import List, Dict, Any
+from string import Template
+from typing import Callable, List, Dict, Any, Optional, Set, Tuple
 import logging
 import re
+from . import clock
+from .api import is_current, load_manifest as load_api_manifest, month_counts, unpublished, week_key, write_api
+from .assets import build_script, build_stylesheet, precompress, report_sizes
+from .build_manifest import BuildManifest, file_hash, inputs_hash
+from .catalog import Catalog
+from .catalog_db import CatalogDB, get_storage
+from .index_store import read_catalogs
+from .metrics import metrics
+from .registry import stores as configured_stores
+from .search import write_site_index
 
 logger = logging.getLogger(__name__)
 
-def format_date_range(valid_from: str, valid_to: str) -> str:
+# Any change to the rendering code invalidates previously built outputs
+RENDERER_HASH = file_hash(__file__)
+
+def format_date_range(valid_from: date, valid_to: date) -> str:
     """Format date range in a more readable way."""
-    from_date = datetime.fromisoformat(valid_from)
-    to_date = datetime.fromisoformat(valid_to)
-    
     # Using %b for abbreviated month name and %d for day
-    return f"{from_date.strftime('%b %d')} — {to_date.strftime('%b %d')}"
+    return f"{valid_from.strftime('%b %d')} — {valid_to.strftime('%b %d')}"
 
-def load_catalogs(store_name: str) -> List[Dict[str, Any]]:
-    """Load catalogs from store-specific index file."""
+def load_catalogs(store_name: str, since: Optional[date] = None) -> List[Catalog]:
+    """
+    Load catalogs from the store-specific index file (through its binary
+    snapshot), or from SQLite when that backend is selected. With ``since``,
+    only catalogs still valid on or after that day are returned.
+    """
     index_file = Path(f'data/index-{store_name.lower()}.json')
+
+    if get_storage() == 'sqlite':
+        db = CatalogDB()
+        if db.count(store_name) == 0:
+            db.import_json(store_name, str(index_file))
+        rows = db.valid_since(since, [store_name]) if since is not None else db.catalogs(store_name)
+        return [c for c in (Catalog.from_dict(row, store_name) for row in rows) if c is not None]
+
     if not index_file.exists():
         logger.warning(f"No index file found for {store_name}")
         return []
-    
-    with open(index_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def minify_css():
-    """Minify CSS file."""
-    css_file = Path('styles.css')
-    minified = ''
-    
-    with open(css_file, 'r', encoding='utf-8') as f:
-        css = f.read()
-        # Remove comments
-        css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
-        # Remove whitespace
-        css = re.sub(r'\s+', ' ', css)
-        # Remove spaces around special characters
-        css = re.sub(r'\s*([\{\}\:\;\,])\s*', r'\1', css)
-        minified = css.strip()
-    
-    # Write minified version
-    with open('styles.min.css', 'w', encoding='utf-8') as f:
-        f.write(minified)
-    
-    return 'styles.min.css'
-
-def generate_html():
-    """Generate index.html with combined catalog data."""
-    def is_this_week(catalog: Dict[str, Any]) -> bool:
-        today = datetime.now().date()
-        valid_from = datetime.fromisoformat(catalog['valid_from']).date()
-        valid_to = datetime.fromisoformat(catalog['valid_to']).date()
-        # Check if today falls between valid_from and valid_to
-        return valid_from <= today <= valid_to
-
-    stores = ['ALDI', 'LIDL', 'SPAR', 'TESCO']
-    all_catalogs = []
-    
-    # Load catalogs from all stores
-    for store in stores:
-        catalogs = load_catalogs(store)
-        for catalog in catalogs:
-            catalog['store'] = store
-            catalog['is_this_week'] = is_this_week(catalog)
-            catalog['date_range'] = format_date_range(catalog['valid_from'], catalog['valid_to'])
-        all_catalogs.extend(catalogs)
-    
-    # Sort catalogs by valid_from date
-    all_catalogs.sort(key=lambda x: x.get('valid_from', ''), reverse=True)
-    
-    # Group catalogs by date range
-    date_groups = {}
-    for catalog in all_catalogs:
-        date_key = catalog['date_range']
-        if date_key not in date_groups:
-            date_groups[date_key] = {
-                'dates': {
-                    'valid_from': catalog['valid_from'],
-                    'valid_to': catalog['valid_to']
-                },
-                'catalogs': [],
-                'is_this_week': is_this_week(catalog)
-            }
-        date_groups[date_key]['catalogs'].append(catalog)
 
-    # Sort date groups by valid_from date
-    sorted_groups = dict(sorted(
-        date_groups.items(),
-        key=lambda x: datetime.fromisoformat(x[1]['dates']['valid_from']),
-        reverse=True
-    ))
-
-    # Reorder groups to show current date first
-    today = datetime.now().date()
-    reordered_groups = {}
-    
-    # First, find the current week's group
-    current_week_key = None
-    for date_range, group in sorted_groups.items():
-        if group['is_this_week']:
-            current_week_key = date_range
-            reordered_groups[date_range] = group
-            break
-    
-    # Then add all other groups
-    for date_range, group in sorted_groups.items():
-        if date_range != current_week_key:
-            reordered_groups[date_range] = group
-
-    # Minify CSS before generating HTML
-    css_file = minify_css()  # This creates and returns 'styles.min.css'
-
-    # Generate HTML with minified CSS
-    html = f"""
-<!DOCTYPE html>
+    start = datetime.combine(since, datetime.min.time()) if since is not None else None
+    return read_catalogs(str(index_file), store_name, start)
+
+ARCHIVE_DIR = 'archive'
+# Archive months and API shards before the window are kept as last built, so an
+# ordinary render only reads recent catalogs; --force rebuilds from all of them
+DEFAULT_WINDOW_WEEKS = 8
+
+def window_start(day: date) -> date:
+    """
+    The Monday on or before the first of ``day``'s month, so that month and
+    every ISO week from then on are read whole.
+    """
+    first = day.replace(day=1)
+    return first - timedelta(days=first.weekday())
+
+# Templates are compiled once at import and filled per chunk while streaming
+PAGE_HEAD = Template("""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <meta name="robots" content="noindex, nofollow">
     <meta name="googlebot" content="noindex, nofollow">
-    <title>Akciós</title>
-    <link rel="preload" href="{css_file}" as="style">
-    <link rel="stylesheet" href="{css_file}">
+    <title>$title</title>
+    <style>$critical_css</style>
+    <link rel="preload" href="$css" as="style" onload="this.onload=null;this.rel='stylesheet'">
+    <noscript><link rel="stylesheet" href="$css"></noscript>
     <link rel="icon" href="/images/favicon.png" type="image/png" sizes="32x32">
     <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
     <meta http-equiv="x-ua-compatible" content="ie=edge">
 </head>
 <body>
     <div class="container">
-    """
-
-    for date_range, group in reordered_groups.items():
-        card_class = "card" + (" this-week" if group['is_this_week'] else "")
-        
-        html += f'<div class="{card_class}"><div class="card-header">'
-        html += f'<div class="date-range">{date_range}</div></div>'
-        html += '<div class="card-content">'
-        
-        for catalog in group['catalogs']:
-            store_name = catalog['store']
-            store_class = f"store-button {store_name.lower()}"
-            html += f'<a href="{catalog["url"]}" target="_blank" class="{store_class}">'
-            html += f'<span>{store_name}</span></a>'
-        
-        html += '</div></div>'
-
-    html += f"""
+    """)
+NAV = Template('<nav class="nav">$links</nav>')
+NAV_LINK = Template('<a href="$href">$label</a>')
+CARD_OPEN = Template('<div class="$card_class"><div class="card-header"><div class="date-range">$date_range</div></div><div class="card-content">')
+STORE_BUTTON = Template('<a href="$url" target="_blank" class="store-button $store_class"><span>$store</span></a>')
+CARD_CLOSE = '</div></div>'
+SEARCH_FORM = Template('<form class="search" role="search" data-index="$index"><input type="search" name="q" placeholder="Search offers, e.g. vaj" autocomplete="off" aria-label="Search offers"></form><div class="search-results"></div><script src="$script" defer></script>')
+MONTH_LINK = Template('<a href="$href" class="archive-month"><span>$label</span><span>$count</span></a>')
+PAGE_FOOT = Template("""
         <div class="footer">
-            Last updated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+            Last updated: $updated
         </div>
     </div>
 </body>
 </html>
+""")
+
+
+class ChunkedWriter:
+    """
+    Collects small string pieces and writes them to a temp file in chunks.
+    The file is moved into place on close, so a failed render leaves the old page intact.
     """
 
-    # Write the HTML file
-    output_file = Path('index.html')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
-    
-    logger.info(f"Generated index.html with {len(all_catalogs)} catalogs")
+    def __init__(self, path: Path, chunk_size: int = 64 * 1024):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.bytes_written = 0
+        self._buffer: List[str] = []
+        self._buffered = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = path.with_name(path.name + '.tmp')
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+
+    def write(self, text: str):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        chunk = ''.join(self._buffer)
+        self._file.write(chunk)
+        self.bytes_written += len(chunk.encode('utf-8'))
+        self._buffer = []
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        self._file.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+
+
+def group_catalogs(all_catalogs: List[Catalog], today: date) -> List[Dict[str, Any]]:
+    """Group catalogs by validity dates, newest first."""
+    date_groups = {}
+    for catalog in sorted(all_catalogs, key=lambda c: c.valid_from, reverse=True):
+        # Group by calendar dates, so stores ending a week at 00:00 and 23:59 share a card
+        date_key = (catalog.valid_from.date(), catalog.valid_to.date())
+        if date_key not in date_groups:
+            valid_from, valid_to = date_key
+            date_groups[date_key] = {
+                'valid_from': valid_from,
+                'valid_to': valid_to,
+                'date_range': format_date_range(valid_from, valid_to),
+                'month': valid_from.strftime('%Y-%m'),
+                'week': week_key(valid_from),
+                'catalogs': [],
+                'is_this_week': valid_from <= today <= valid_to,
+            }
+        date_groups[date_key]['catalogs'].append(catalog)
+    return list(date_groups.values())
+
+
+def landing_groups(groups: List[Dict[str, Any]], today: date) -> List[Dict[str, Any]]:
+    """Current and upcoming groups for the landing page, current week first."""
+    selected = [g for g in groups if g['valid_to'] >= today]
+    if not selected:
+        # Nothing valid right now: show the latest catalogs instead of an empty page
+        selected = groups[:1]
+    return sorted(selected, key=lambda g: not g['is_this_week'])
+
+
+def write_cards(out: ChunkedWriter, groups: List[Dict[str, Any]]):
+    for group in groups:
+        card_class = "card" + (" this-week" if group['is_this_week'] else "")
+        out.write(CARD_OPEN.substitute(card_class=card_class, date_range=escape(group['date_range'])))
+        for catalog in group['catalogs']:
+            store_name = catalog.store
+            out.write(STORE_BUTTON.substitute(
+                url=escape(catalog.url),
+                store_class=store_name.lower(),
+                store=escape(store_name),
+            ))
+        out.write(CARD_CLOSE)
+
+
+def write_nav(out: ChunkedWriter, links: List[Tuple[str, str]]):
+    out.write(NAV.substitute(links=''.join(
+        NAV_LINK.substitute(href=escape(href), label=escape(label)) for href, label in links
+    )))
+
+
+def month_label(month: str) -> str:
+    return datetime.strptime(month, '%Y-%m').strftime('%B %Y')
+
+
+def page_classes(stores) -> Set[str]:
+    """CSS classes the page templates can produce, i.e. everything styled at first paint."""
+    # Values of the $card_class and $store_class placeholders
+    classes = {'card', 'this-week'} | {store.lower() for store in stores}
+    for template in (PAGE_HEAD, NAV, CARD_OPEN, STORE_BUTTON, SEARCH_FORM, MONTH_LINK, PAGE_FOOT):
+        for value in re.findall(r'class="([^"]*)"', template.template):
+            classes.update(name for name in value.split() if not name.startswith('$'))
+    return classes
+
+
+def render_page(path: Path, title: str, css: str, critical_css: str, nav: List[Tuple[str, str]],
+                body: Callable[[ChunkedWriter], None]) -> int:
+    """Stream one page to disk; returns the number of bytes written."""
+    with ChunkedWriter(path) as out:
+        out.write(PAGE_HEAD.substitute(title=escape(title), css=css, critical_css=critical_css))
+        if nav:
+            write_nav(out, nav)
+        body(out)
+        out.write(PAGE_FOOT.substitute(updated=clock.now().strftime("%Y-%m-%d %H:%M:%S")))
+    return out.bytes_written
+
+
+def group_digest(groups: List[Dict[str, Any]]) -> List[Any]:
+    return [
+        [g['valid_from'].isoformat(), g['valid_to'].isoformat(), g['is_this_week'],
+         [(c.store, c.url) for c in g['catalogs']]]
+        for g in groups
+    ]
+
+
+@metrics.timed('generate_html', profile=True)
+def generate_html(window_weeks: Optional[int] = None, force: bool = False):
+    """
+    Generate index.html with current and upcoming catalogs, plus one archive
+    page per month under archive/.
+    Only catalogs valid during the last ``window_weeks`` weeks (default
+    DEFAULT_WINDOW_WEEKS) are read; archive pages and API shards of the months
+    before are kept as last built. With ``force``, or without a previous
+    build to keep them from, every catalog is read and every output rebuilt.
+    Pages whose inputs are unchanged since the last build are skipped unless ``force`` is set.
+    """
+    today = clock.now().date()
+
+    stores = configured_stores()
+    archive_dir = Path(ARCHIVE_DIR)
+
+    # Months before the window: catalog counts from the API manifest, pages as built
+    since = None
+    settled: Dict[str, int] = {}
+    api_manifest = load_api_manifest()
+    if not force and is_current(api_manifest):
+        weeks = window_weeks if window_weeks is not None else DEFAULT_WINDOW_WEEKS
+        since = window_start(today - timedelta(weeks=weeks))
+        settled = month_counts(api_manifest, before=since)
+        missing = [month for month in settled if not (archive_dir / f'{month}.html').exists()]
+        if missing:
+            logger.info(f"Archive pages missing for {', '.join(missing)}, reading every catalog")
+            since, settled = None, {}
+
+    def load(since: Optional[date]) -> List[Catalog]:
+        loaded = []
+        for store in stores:
+            catalogs = load_catalogs(store, since)
+            for catalog in catalogs:
+                catalog.store = store
+            loaded.extend(catalogs)
+        return loaded
+
+    # Load catalogs from all stores
+    all_catalogs = load(since)
+    if since is not None and not all_catalogs:
+        # The landing page falls back to the latest catalogs, wherever they are
+        logger.info(f"No catalogs valid since {since}, reading every catalog")
+        since, settled = None, {}
+        all_catalogs = load(since)
+    if since is not None:
+        # A new or changed catalog that started before the window reopens its month
+        stale = unpublished([c for c in all_catalogs if c.valid_from.date() < since])
+        if stale:
+            since = window_start(min(c.valid_from.date() for c in stale))
+            settled = month_counts(api_manifest, before=since)
+            logger.info(f"{len(stale)} catalogs changed before the window, reading catalogs since {since}")
+            all_catalogs = load(since)
+
+    # Hashed assets first: the pages reference them by name
+    manifest = BuildManifest(force=force)
+    css_file, critical = build_stylesheet('styles.css', page_classes(stores), manifest)
+    script_file = build_script('search.js')
+    shared_inputs = {'css': css_file, 'critical': critical, 'renderer': RENDERER_HASH}
+
+    groups = group_catalogs(all_catalogs, today)
+    # Months that were read whole; catalogs valid since an earlier month only show on the landing page
+    months: Dict[str, List[Dict[str, Any]]] = {}
+    for group in groups:
+        if since is None or group['valid_from'].replace(day=1) >= since:
+            months.setdefault(group['month'], []).append(group)
+    counts = {**settled, **{m: sum(len(g['catalogs']) for g in months[m]) for m in months}}
+    month_keys = sorted(counts, reverse=True)  # newest first
+
+    archive_index = archive_dir / 'index.html'
+    rendered = skipped = 0
+
+    def build(path: Path, inputs: Dict[str, Any], title: str, css: str,
+              nav: List[Tuple[str, str]], body: Callable[[ChunkedWriter], None]):
+        nonlocal rendered, skipped
+        digest = inputs_hash({**inputs, **shared_inputs})
+        if manifest.is_fresh(str(path), digest):
+            skipped += 1
+            return
+        size = render_page(path, title, css, critical, nav, body)
+        manifest.record(str(path), digest)
+        rendered += 1
+        logger.debug(f"Rendered {path} ({size} bytes)")
+
+    # Static JSON API; shards before the window are kept, unchanged ones are skipped by hash
+    write_api(groups, all_catalogs, since)
+
+    # Prebuilt, sharded offer search for the current and upcoming weeks
+    search_meta = write_site_index(since=today)
+
+    def write_landing(out: ChunkedWriter):
+        if search_meta:
+            out.write(SEARCH_FORM.substitute(index=escape(search_meta), script=escape(script_file)))
+        write_cards(out, landing)
+
+    # Landing page: only the current and upcoming weeks
+    landing = landing_groups(groups, today)
+    build(
+        Path('index.html'),
+        {'groups': group_digest(landing), 'archive': bool(month_keys),
+         'search': search_meta and script_file},
+        'Akciós', css_file,
+        [(f'{ARCHIVE_DIR}/index.html', 'Archive')] if month_keys else [],
+        write_landing,
+    )
+
+    # Archive index: one link per month
+    def write_month_links(out: ChunkedWriter):
+        out.write('<div class="card"><div class="card-content">')
+        for month in month_keys:
+            out.write(MONTH_LINK.substitute(href=f'{month}.html', label=escape(month_label(month)),
+                                            count=counts[month]))
+        out.write(CARD_CLOSE)
+
+    build(
+        archive_index,
+        {'months': [(m, counts[m]) for m in month_keys]},
+        'Akciós archive', f'../{css_file}',
+        [('../index.html', 'Current')],
+        write_month_links,
+    )
+
+    # One page per month read whole, linked to its neighbours
+    for position, month in enumerate(month_keys):
+        if month not in months:
+            continue
+        newer = month_keys[position - 1] if position > 0 else None
+        older = month_keys[position + 1] if position + 1 < len(month_keys) else None
+        nav = []
+        if newer:
+            nav.append((f'{newer}.html', f'← {month_label(newer)}'))
+        nav += [('../index.html', 'Current'), ('index.html', 'Archive')]
+        if older:
+            nav.append((f'{older}.html', f'{month_label(older)} →'))
+        month_groups = months[month]
+        build(
+            archive_dir / f'{month}.html',
+            {'groups': group_digest(month_groups), 'newer': newer, 'older': older},
+            f'Akciós {month_label(month)}', f'../{css_file}',
+            nav,
+            lambda out, month_groups=month_groups: write_cards(out, month_groups),
+        )
+
+    report_sizes(precompress(manifest))
+    manifest.save()
+    logger.info(f"Generated pages for {len(all_catalogs)} catalogs: "
+                f"{rendered} rendered, {skipped} unchanged")
 
 if __name__ == '__main__':
-    generate_html() 
\ No newline at end of file
+    generate_html()
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from .fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = 'data/http-cache'
+
+# How long a 404/410 from a URL probe is trusted before the URL is probed again
+DEFAULT_NEGATIVE_TTL = 3 * 3600
+
+# Statuses remembered as "known missing"
+NEGATIVE_STATUSES = frozenset({404, 410})
+
+
+def header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    """A response header by case-insensitive name; HTTP/2 sends every name in lower case."""
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+
+class HttpCache:
+    """
+    Persistent HTTP cache shared by all crawlers.
+
+    Stores response validators (ETag/Last-Modified) with the body so repeated
+    GETs can be revalidated with a conditional request, and remembers 404s from
+    URL probes for ``negative_ttl`` seconds so known-missing URLs are skipped.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_DIR, negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self.index_file = os.path.join(path, 'index.json')
+        self.stats = {'hits': 0, 'misses': 0, 'revalidations': 0, 'negative_hits': 0}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+            logger.debug(f"Loaded {len(self._entries)} HTTP cache entries")
+        except (json.JSONDecodeError, OSError):
+            logger.error("Error reading HTTP cache index, starting fresh")
+            self._entries = {}
+
+    def save(self):
+        """Persist the cache index, dropping expired negative entries."""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            self._entries = {
+                url: entry for url, entry in self._entries.items()
+                if 'missing_until' not in entry or entry['missing_until'] > now
+            }
+            data = json.dumps(self._entries, ensure_ascii=False, separators=(',', ':'))
+            self._dirty = False
+        atomic_write(self.index_file, data.encode('utf-8'))
+
+    def _body_file(self, url: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.body')
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    # Conditional GET
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Validators to send with a GET so an unchanged page comes back as 304."""
+        entry = self._entries.get(url)
+        if not entry or not os.path.exists(self._body_file(url)):
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        if headers:
+            self._count('revalidations')
+        return headers
+
+    def cached_body(self, url: str) -> Optional[bytes]:
+        """Return the stored body for a URL that was revalidated with a 304."""
+        try:
+            with open(self._body_file(url), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        self._count('hits')
+        return body
+
+    def iter_cached_body(self, url: str, chunk_size: int = 65536) -> Optional[Iterator[bytes]]:
+        """Like cached_body, but reads the stored body in chunks."""
+        try:
+            f = open(self._body_file(url), 'rb')
+        except OSError:
+            return None
+        self._count('hits')
+
+        def chunks():
+            with f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        return chunks()
+
+    def cached_headers(self, url: str) -> Dict[str, str]:
+        entry = self._entries.get(url) or {}
+        return dict(entry.get('headers') or {})
+
+    def store(self, url: str, status_code: int, headers: Mapping[str, str], body: bytes):
+        """Remember a full response; only responses with validators are worth keeping."""
+        self._count('misses')
+        if status_code != 200 or not (header(headers, 'ETag') or header(headers, 'Last-Modified')):
+            return
+        atomic_write(self._body_file(url), body)
+        self._add_entry(url, status_code, headers, len(body))
+
+    def store_stream(self, url: str, status_code: int, headers: Mapping[str, str]) -> Optional['BodyWriter']:
+        """
+        Start storing a streamed response. Returns a writer the caller feeds
+        chunks to and commits once the body is complete, or None if the
+        response is not cacheable.
+        """
+        self._count('misses')
+        if status_code != 200 or not (header(headers, 'ETag') or header(headers, 'Last-Modified')):
+            return None
+        return BodyWriter(self, url, status_code, headers)
+
+    def _add_entry(self, url: str, status_code: int, headers: Mapping[str, str], size: int):
+        with self._lock:
+            self._entries[url] = {
+                'status': status_code,
+                'etag': header(headers, 'ETag'),
+                'last_modified': header(headers, 'Last-Modified'),
+                'headers': {k: v for k, v in headers.items() if k.lower() == 'content-type'},
+                'size': size,
+                'stored_at': time.time(),
+            }
+            self._dirty = True
+
+    # Negative caching for URL probes
+
+    def is_known_missing(self, url: str) -> bool:
+        entry = self._entries.get(url)
+        if entry and entry.get('missing_until', 0) > time.time():
+            self._count('negative_hits')
+            return True
+        return False
+
+    def remember_status(self, url: str, status_code: int):
+        """Record the outcome of a probe: 404/410 become negative entries, anything else clears them."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if status_code in NEGATIVE_STATUSES:
+                self._entries[url] = {
+                    'status': status_code,
+                    'missing_until': time.time() + self.negative_ttl,
+                }
+                self._dirty = True
+            elif entry and 'missing_until' in entry:
+                del self._entries[url]
+                self._dirty = True
+
+    def summary(self) -> str:
+        return ', '.join(f"{name}={count}" for name, count in self.stats.items())
+
+
+class BodyWriter:
+    """Writes a streamed body to a temp file; the cache entry is only added on commit."""
+
+    def __init__(self, cache: HttpCache, url: str, status_code: int, headers: Mapping[str, str]):
+        self.cache = cache
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.size = 0
+        os.makedirs(cache.path, exist_ok=True)
+        self._path = cache._body_file(url)
+        self._tmp_path = f"{self._path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._tmp_path, self._path)
+        self.cache._add_entry(self.url, self.status_code, self.headers, self.size)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
@@ -0,0 +1,393 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Iterator, Mapping, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .budget import DeadlineExceeded
+from .cassette import Cassette
+from .circuit import CircuitBreakers, CircuitOpenError
+from .http_cache import HttpCache
+from .metrics import metrics
+from .scheduler import DEFAULT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Single header policy shared by every crawler
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'hu-HU,hu;q=0.9,en;q=0.8',
+}
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5.0, 15.0)
+
+# Responses worth retrying with backoff
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+Timeout = Union[float, Tuple[float, float]]
+
+# Comma separated "https://www.lidl.hu=http://127.0.0.1:8000/www.lidl.hu" pairs
+# that send requests for a URL prefix elsewhere, e.g. to the benchmark server
+HOST_MAP_ENV = 'AKCIOS_HOST_MAP'
+
+
+def parse_host_map(value: Optional[str]) -> Dict[str, str]:
+    host_map = {}
+    for pair in (value or '').split(','):
+        if '=' in pair:
+            prefix, target = pair.split('=', 1)
+            host_map[prefix.strip()] = target.strip()
+    return host_map
+
+
+class HttpResponse:
+    """
+    Minimal response object used where requests.Response is not available
+    (HTTP/2 backend, cache and cassette). Headers are case-insensitive like
+    requests', since HTTP/2 sends every name in lower case.
+    """
+
+    def __init__(self, url: str, status_code: int, headers: Mapping[str, str], content: bytes = b'',
+                 chunks: Optional[Iterator[bytes]] = None, closer=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self._content = content
+        self._chunks = chunks
+        self._closer = closer
+        self.encoding = 'utf-8'
+
+    @property
+    def content(self) -> bytes:
+        if self._chunks is not None:
+            self._content = b''.join(self._chunks)
+            self._chunks = None
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} error for url: {self.url}", response=self)
+
+    def iter_content(self, chunk_size: int = 65536) -> Iterator[bytes]:
+        if self._chunks is not None:
+            chunks, self._chunks = self._chunks, None
+            yield from chunks
+            return
+        for start in range(0, len(self._content), chunk_size):
+            yield self._content[start:start + chunk_size]
+
+    def close(self):
+        if self._closer is not None:
+            self._closer()
+            self._closer = None
+
+
+class HttpClient:
+    """
+    Shared HTTP transport for all crawlers.
+
+    Keeps a keep-alive connection pool per host, applies one header policy,
+    bounded connect/read timeouts and retries 429/5xx responses and connection
+    errors with exponential backoff and jitter. When ``http2`` is requested and
+    httpx (with h2) is installed, requests go over HTTP/2 instead. With a
+    ``cache`` attached, ``use_cache=True`` requests are revalidated and
+    negatively cached through it. With ``breakers``, requests to hosts whose
+    circuit is open fail fast with CircuitOpenError. With a ``deadline``
+    (time.monotonic()), timeouts and retries are cut to the time left and no
+    request starts after it. With a ``cassette``, traffic is recorded to it
+    or replayed from it instead of going to the network.
+    """
+
+    def __init__(self,
+                 timeout: Timeout = DEFAULT_TIMEOUT,
+                 retries: int = 3,
+                 backoff: float = 0.5,
+                 max_backoff: float = 10.0,
+                 pool_connections: int = DEFAULT_WORKERS,
+                 pool_maxsize: int = DEFAULT_WORKERS,
+                 headers: Optional[Dict[str, str]] = None,
+                 http2: bool = False,
+                 cache: Optional[HttpCache] = None,
+                 host_map: Optional[Dict[str, str]] = None,
+                 breakers: Optional[CircuitBreakers] = None,
+                 deadline: Optional[float] = None,
+                 cassette: Optional[Cassette] = None):
+        self.timeout = timeout
+        self.cache = cache
+        self.breakers = breakers
+        self.deadline = deadline
+        self.cassette = cassette
+        self.host_map = host_map if host_map is not None else parse_host_map(os.environ.get(HOST_MAP_ENV))
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.headers = dict(DEFAULT_HEADERS)
+        if headers:
+            self.headers.update(headers)
+
+        self._transient_errors: Tuple[type, ...] = (requests.ConnectionError, requests.Timeout)
+        self._httpx = None
+        if http2:
+            self._httpx = self._make_httpx_client(pool_maxsize)
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Retries are handled in request() so both backends behave the same
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _make_httpx_client(self, pool_maxsize: int):
+        try:
+            import httpx
+            import h2  # noqa: F401  (httpx needs it for HTTP/2)
+        except ImportError:
+            logger.info("httpx[http2] not installed, falling back to HTTP/1.1")
+            return None
+        connect, read = self._split_timeout(self.timeout)
+        self._transient_errors += (httpx.TransportError,)
+        self._httpx_timeout = httpx.Timeout
+        return httpx.Client(
+            http2=True,
+            headers=self.headers,
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_keepalive_connections=pool_maxsize, max_connections=pool_maxsize * 4),
+        )
+
+    @staticmethod
+    def _split_timeout(timeout: Timeout) -> Tuple[float, float]:
+        if isinstance(timeout, tuple):
+            return timeout
+        return timeout, timeout
+
+    def _backoff_delay(self, attempt: int, response=None) -> float:
+        """Exponential backoff with full jitter, honouring Retry-After when given."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        return random.uniform(0, delay)
+
+    def _send(self, method: str, url: str, timeout: Timeout, stream: bool, **kwargs):
+        if self.cassette is not None:
+            return self.cassette.send(method, url, lambda: self._send_live(method, url, timeout, stream, **kwargs))
+        return self._send_live(method, url, timeout, stream, **kwargs)
+
+    def _send_live(self, method: str, url: str, timeout: Timeout, stream: bool, **kwargs):
+        url = self._rewrite(url)
+        if self._httpx is None:
+            return self.session.request(method, url, timeout=timeout, stream=stream, **kwargs)
+
+        allow_redirects = kwargs.pop('allow_redirects', method != 'HEAD')
+        connect, read = self._split_timeout(timeout)
+        request = self._httpx.build_request(method, url, timeout=self._httpx_timeout(read, connect=connect), **kwargs)
+        response = self._httpx.send(request, stream=stream, follow_redirects=allow_redirects)
+        if stream:
+            return HttpResponse(str(response.url), response.status_code, response.headers,
+                                chunks=response.iter_bytes(), closer=response.close)
+        return HttpResponse(str(response.url), response.status_code, response.headers, content=response.content)
+
+    def _rewrite(self, url: str) -> str:
+        for prefix, target in self.host_map.items():
+            if url.startswith(prefix):
+                return target + url[len(prefix):]
+        return url
+
+    def _time_left(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def request(self, method: str, url: str, timeout: Optional[Timeout] = None,
+                stream: bool = False, **kwargs):
+        """Send a request, retrying transient failures; the outcome feeds the host's circuit breaker."""
+        host = urlsplit(url).netloc
+        breakers = self.breakers
+        if breakers is None:
+            return self._request(method, host, url, timeout, stream, **kwargs)
+
+        if breakers.is_open(host):
+            metrics.count('http_circuit_open_total', host=host)
+            raise CircuitOpenError(f"Circuit open for {host}, skipping {url}")
+        try:
+            response = self._request(method, host, url, timeout, stream, **kwargs)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if self._is_transient(e):
+                breakers.record_failure(host, f"{type(e).__name__}: {e}")
+            raise
+        if response.status_code in RETRY_STATUSES:
+            breakers.record_failure(host, f"HTTP {response.status_code}")
+        else:
+            breakers.record_success(host)
+        return response
+
+    def _request(self, method: str, host: str, url: str, timeout: Optional[Timeout],
+                 stream: bool, **kwargs):
+        timeout = timeout if timeout is not None else self.timeout
+        attempt = 0
+        while True:
+            left = self._time_left()
+            if left is not None:
+                if left <= 0:
+                    raise DeadlineExceeded(f"Run deadline passed before {method} {url}")
+                connect, read = self._split_timeout(timeout)
+                timeout = (min(connect, left), min(read, left))
+            start = time.perf_counter()
+            try:
+                response = self._send(method, url, timeout, stream, **kwargs)
+            except Exception as e:
+                metrics.observe_http(method, host, None, time.perf_counter() - start)
+                if attempt >= self.retries or not self._is_transient(e):
+                    raise
+                delay = self._backoff_delay(attempt)
+                left = self._time_left()
+                if left is not None and delay >= left:
+                    raise
+                logger.debug(f"{method} {url} failed ({e}), retrying in {delay:.2f}s")
+            else:
+                metrics.observe_http(method, host, response.status_code, time.perf_counter() - start)
+                left = self._time_left()
+                out_of_time = left is not None and self._backoff_delay(attempt, response) >= left
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries or out_of_time:
+                    if not stream:
+                        metrics.count('http_bytes_total', len(response.content), host=host)
+                    return response
+                delay = self._backoff_delay(attempt, response)
+                logger.debug(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+                response.close()
+            metrics.count('http_retries_total', host=host)
+            time.sleep(delay)
+            attempt += 1
+
+    def _is_transient(self, error: Exception) -> bool:
+        return isinstance(error, self._transient_errors)
+
+    def get(self, url: str, use_cache: bool = False, **kwargs):
+        if not use_cache or self.cache is None:
+            return self.request('GET', url, **kwargs)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers.update(self.cache.conditional_headers(url))
+        response = self.request('GET', url, headers=headers, **kwargs)
+        if response.status_code == 304:
+            body = self.cache.cached_body(url)
+            if body is not None:
+                logger.debug(f"Not modified, serving {url} from cache")
+                return HttpResponse(url, 200, self.cache.cached_headers(url), content=body)
+            # Cache body vanished: fetch it again unconditionally
+            response = self.request('GET', url, **kwargs)
+        self.cache.store(url, response.status_code, response.headers, response.content)
+        return response
+
+    def iter_content(self, url: str, use_cache: bool = False, chunk_size: int = 65536,
+                     max_bytes: Optional[int] = None, **kwargs) -> Iterator[bytes]:
+        """
+        Stream a GET response body in chunks without holding it in memory.
+
+        Stops after ``max_bytes`` with a warning. With ``use_cache``, an
+        unchanged page is replayed from the cache and a complete new body is
+        written to it as it streams by.
+        """
+        headers = dict(kwargs.pop('headers', None) or {})
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            headers.update(cache.conditional_headers(url))
+
+        response = self.request('GET', url, headers=headers, stream=True, **kwargs)
+        writer = None
+        try:
+            if response.status_code == 304 and cache is not None:
+                cached = cache.iter_cached_body(url, chunk_size)
+                if cached is not None:
+                    logger.debug(f"Not modified, serving {url} from cache")
+                    yield from cached
+                    return
+                # Cache body vanished: fetch it again unconditionally
+                response.close()
+                response = self.request('GET', url, stream=True, **kwargs)
+            if response.status_code >= 400:
+                raise requests.HTTPError(f"{response.status_code} error for url: {url}", response=response)
+
+            if cache is not None:
+                writer = cache.store_stream(url, response.status_code, response.headers)
+            received = 0
+            host = urlsplit(url).netloc
+            for chunk in response.iter_content(chunk_size):
+                received += len(chunk)
+                metrics.count('http_bytes_total', len(chunk), host=host)
+                if max_bytes is not None and received > max_bytes:
+                    logger.warning(f"Response from {url} exceeded {max_bytes} bytes, truncated")
+                    return
+                if writer is not None:
+                    writer.write(chunk)
+                yield chunk
+            if writer is not None:
+                writer.commit()
+                writer = None
+        finally:
+            # Incomplete bodies never make it into the cache
+            if writer is not None:
+                writer.abort()
+            response.close()
+
+    def head(self, url: str, use_cache: bool = False, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        if not use_cache or self.cache is None:
+            return self.request('HEAD', url, **kwargs)
+
+        if self.cache.is_known_missing(url):
+            logger.debug(f"Known missing, skipping probe of {url}")
+            return HttpResponse(url, 404, {})
+        response = self.request('HEAD', url, **kwargs)
+        self.cache.remember_status(url, response.status_code)
+        return response
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.save()
+        if self.breakers is not None:
+            self.breakers.save()
+        if self.cassette is not None:
+            self.cassette.save()
+        self.session.close()
+        if self._httpx is not None:
+            self._httpx.close()
+
+
+_shared_client: Optional[HttpClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Return the process-wide client so every crawler reuses the same connection pools."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
+
+
+def set_http_client(client: Optional[HttpClient]):
+    """Replace the process-wide client, e.g. to change timeouts or enable HTTP/2."""
+    global _shared_client
+    with _shared_lock:
+        _shared_client = client
@@ -0,0 +1,281 @@
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+import hashlib
+from html.parser import HTMLParser
+import json
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from .fileio import atomic_write
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from .base_crawler import BaseCrawler
+    from .catalog import Catalog
+    from .http_client import HttpClient
+    from .scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+IMAGES_DIR = 'data/images'
+THUMBNAIL_SIZE = (320, 320)
+CHUNK_SIZE = 64 * 1024
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+class _ImageParser(HTMLParser):
+    """Collects image URLs from <img> tags and og:image meta tags."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.urls: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'img':
+            for name in ('data-src', 'src'):
+                if attrs.get(name):
+                    self.urls.append(attrs[name])
+                    break
+            if attrs.get('srcset'):
+                # The last srcset candidate is usually the largest
+                self.urls.append(attrs['srcset'].split(',')[-1].split()[0])
+        elif tag == 'meta' and attrs.get('property') == 'og:image' and attrs.get('content'):
+            self.urls.append(attrs['content'])
+
+
+def extract_image_urls(html: str, base_url: str) -> List[str]:
+    """Absolute, de-duplicated URLs of the page images referenced by a catalog page."""
+    parser = _ImageParser()
+    parser.feed(html)
+    parser.close()
+    urls = []
+    for url in parser.urls:
+        url = urljoin(base_url, url)
+        if urlsplit(url).path.lower().endswith(IMAGE_EXTENSIONS) and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def make_thumbnail(source: str, target: str, size: Tuple[int, int] = THUMBNAIL_SIZE) -> str:
+    """Resize an image into a JPEG thumbnail. Runs in a worker process."""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.thumbnail(size)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        image.convert('RGB').save(tmp_path, 'JPEG', quality=80, optimize=True)
+    os.replace(tmp_path, target)
+    return target
+
+
+class ImageStore:
+    """
+    Content-addressed store for catalog page images under data/images.
+
+    Images live at <hash[:2]>/<sha256>.<ext>, so identical pages across weeks
+    are stored once. index.json maps image URLs to their hashes and catalogs
+    to their pages. Interrupted downloads are kept in .partial/ and resumed
+    with a Range request. With ``save_to``, the index is read from the
+    store but written there instead, for a shard worker.
+    """
+
+    def __init__(self, root: str = IMAGES_DIR, save_to: Optional[str] = None):
+        self.root = root
+        self.index_file = os.path.join(root, 'index.json')
+        self.save_to = save_to or self.index_file
+        self.partial_dir = os.path.join(root, '.partial')
+        self.thumbs_dir = os.path.join(root, 'thumbs')
+        self.images: Dict[str, Dict[str, object]] = {}
+        self.catalogs: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.images = data.get('images', {})
+            self.catalogs = data.get('catalogs', {})
+
+    def path_for(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}{ext}")
+
+    def thumbnail_for(self, digest: str) -> str:
+        return os.path.join(self.thumbs_dir, f"{digest}.jpg")
+
+    def has_image(self, url: str) -> bool:
+        entry = self.images.get(url)
+        return bool(entry) and os.path.exists(self.path_for(entry['sha256'], entry['ext']))
+
+    def download(self, http: 'HttpClient', url: str) -> Optional[str]:
+        """Stream an image to disk, resuming a partial download; returns its path."""
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        # Catalogs may share page URLs; only one thread writes a given partial file
+        with url_lock:
+            return self._download(http, url)
+
+    def _download(self, http: 'HttpClient', url: str) -> Optional[str]:
+        if self.has_image(url):
+            entry = self.images[url]
+            return self.path_for(entry['sha256'], entry['ext'])
+
+        os.makedirs(self.partial_dir, exist_ok=True)
+        partial = os.path.join(self.partial_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.part')
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        response = http.request('GET', url, stream=True, headers=headers)
+        try:
+            if response.status_code == 416 and offset:
+                # The partial file already holds the whole image
+                pass
+            elif response.status_code == 206 and offset:
+                self._append(response, partial, 'ab')
+            elif response.status_code == 200:
+                self._append(response, partial, 'wb')
+            else:
+                logger.debug(f"Image download failed for {url}: {response.status_code}")
+                return None
+        finally:
+            response.close()
+
+        # Hash the finished file in chunks; never hold it in memory
+        digest = hashlib.sha256()
+        with open(partial, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        ext = os.path.splitext(urlsplit(url).path)[1].lower() or '.jpg'
+        stored = self._stored_extension(sha256)
+        if stored is not None:
+            # Same page already stored, possibly under another URL or extension
+            os.remove(partial)
+            ext = stored
+        target = self.path_for(sha256, ext)
+        if stored is None:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(partial, target)
+
+        with self._lock:
+            self.images[url] = {'sha256': sha256, 'ext': ext, 'size': os.path.getsize(target)}
+        return target
+
+    def _stored_extension(self, digest: str) -> Optional[str]:
+        directory = os.path.join(self.root, digest[:2])
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith(digest):
+                    return os.path.splitext(name)[1]
+        return None
+
+    @staticmethod
+    def _append(response, path: str, mode: str):
+        with open(path, mode) as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                metrics.count('image_bytes_total', len(chunk))
+
+    def save(self):
+        with self._lock:
+            payload = json.dumps({'images': self.images, 'catalogs': self.catalogs},
+                                 ensure_ascii=False, indent=2, sort_keys=True)
+        atomic_write(self.save_to, payload.encode('utf-8'))
+
+
+@metrics.timed('download_images')
+def download_catalog_images(jobs: Sequence[Tuple['BaseCrawler', List['Catalog']]],
+                            scheduler: Optional['Scheduler'] = None,
+                            thumbnail_workers: Optional[int] = None,
+                            store: Optional[ImageStore] = None) -> Dict[str, int]:
+    """
+    Download page images for newly found catalogs.
+
+    ``jobs`` pairs each crawler with the catalogs it found. Catalog pages are
+    discovered and every page image fetched on the shared scheduler as tasks
+    of their store, so its global and per-host limits hold and the pages of
+    one catalog download side by side. Thumbnails are made on a process pool
+    as downloads finish, so resizing never blocks the network-bound work.
+    """
+    from .scheduler import get_scheduler
+
+    scheduler = scheduler or get_scheduler()
+    store = store or ImageStore()
+    stats = {'catalogs': 0, 'downloaded': 0, 'skipped': 0, 'failed': 0, 'thumbnails': 0}
+    stats_lock = threading.Lock()
+
+    def bump(name: str):
+        with stats_lock:
+            stats[name] += 1
+
+    try:
+        import PIL  # noqa: F401
+        thumbnails = ProcessPoolExecutor(max_workers=thumbnail_workers)
+    except ImportError:
+        logger.info("Pillow not installed, skipping thumbnails")
+        thumbnails = None
+    thumbnail_futures: List[Future] = []
+
+    def fetch_image(http: 'HttpClient', url: str) -> Optional[str]:
+        already = store.has_image(url)
+        try:
+            path = store.download(http, url)
+        except Exception as e:
+            logger.debug(f"Image download failed for {url}: {e}")
+            path = None
+        if path is None:
+            bump('failed')
+            return None
+        bump('skipped' if already else 'downloaded')
+        digest = os.path.basename(path).split('.')[0]
+        thumb = store.thumbnail_for(digest)
+        if thumbnails is not None and not os.path.exists(thumb):
+            os.makedirs(store.thumbs_dir, exist_ok=True)
+            thumbnail_futures.append(thumbnails.submit(make_thumbnail, path, thumb))
+        return digest
+
+    def submit(crawler: 'BaseCrawler', url: str, func, *args) -> Future:
+        return scheduler.submit(crawler.store_name, urlsplit(url).netloc, func, *args)
+
+    # Image fetches are submitted from this thread, never from a task, so a
+    # task never waits on others and the workers cannot block each other
+    pages: Dict[Future, Tuple['BaseCrawler', str]] = {}
+    for crawler, catalogs in jobs:
+        for catalog in catalogs:
+            if catalog.url in store.catalogs:
+                continue  # Every page of this catalog is already stored
+            pages[submit(crawler, catalog.url, crawler.get_page_image_urls, catalog.url)] = (crawler, catalog.url)
+
+    images: List[Tuple[str, List[str], List[Future]]] = []
+    for future in as_completed(pages):
+        crawler, catalog_url = pages[future]
+        try:
+            image_urls = future.result()
+        except Exception as e:
+            logger.error(f"Error downloading catalog images: {e}")
+            continue
+        images.append((catalog_url, image_urls,
+                       [submit(crawler, url, fetch_image, crawler.http, url) for url in image_urls]))
+
+    for catalog_url, image_urls, futures in images:
+        digests = [future.result() for future in futures]
+        if image_urls and all(digests):
+            with store._lock:
+                store.catalogs[catalog_url] = digests
+        bump('catalogs')
+
+    if thumbnails is not None:
+        for future in thumbnail_futures:
+            try:
+                future.result()
+                stats['thumbnails'] += 1
+            except Exception as e:
+                logger.debug(f"Thumbnail failed: {e}")
+        thumbnails.shutdown()
+
+    store.save()
+    for name, value in stats.items():
+        metrics.count('images_total', value, result=name)
+    logger.info("Catalog images: " + ', '.join(f"{k}={v}" for k, v in stats.items()))
+    return stats
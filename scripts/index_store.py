@@ -0,0 +1,83 @@
+from datetime import datetime
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from .catalog import Catalog
+from .fileio import atomic_write
+from .snapshot import read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Fields that change on every run without the catalog itself changing
+VOLATILE_FIELDS = frozenset({'last_updated'})
+
+class DateTimeEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super().default(obj)
+
+def stable_fields(catalog: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in catalog.items() if k not in VOLATILE_FIELDS}
+
+def catalogs_fingerprint(catalogs: List[Catalog]) -> str:
+    """Hash of the catalog data, ignoring volatile fields and entry order."""
+    stable = sorted((stable_fields(c.to_dict()) for c in catalogs), key=lambda c: c['url'])
+    payload = json.dumps(stable, cls=DateTimeEncoder, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_index(index_file: str) -> List[Dict[str, Any]]:
+    """Load a store index file, returning an empty list if it is missing or corrupt."""
+    if not os.path.exists(index_file):
+        return []
+    with open(index_file, 'r', encoding='utf-8') as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            logger.error("Error reading existing file, starting fresh")
+            return []
+
+def write_index(index_file: str, catalogs: List[Dict[str, Any]], compact: bool = False) -> str:
+    """Atomically write a store index file; returns the SHA-256 of what was written."""
+    if compact:
+        payload = json.dumps(catalogs, cls=DateTimeEncoder, ensure_ascii=False, separators=(',', ':'))
+    else:
+        payload = json.dumps(catalogs, cls=DateTimeEncoder, ensure_ascii=False, indent=2)
+    data = payload.encode('utf-8')
+    atomic_write(index_file, data)
+    return hashlib.sha256(data).hexdigest()
+
+def snapshot_file(index_file: str) -> str:
+    """Binary snapshot kept next to an index file: data/index-lidl.json -> data/index-lidl.snapshot."""
+    return os.path.splitext(index_file)[0] + '.snapshot'
+
+def read_catalogs(index_file: str, store: Optional[str] = None,
+                  since: Optional[datetime] = None) -> List[Catalog]:
+    """
+    Catalog records of a store index file, optionally only those still valid
+    at ``since``. The binary snapshot is used while it matches the file's
+    content; otherwise the JSON is parsed once and the snapshot rebuilt.
+    """
+    if not os.path.exists(index_file):
+        return []
+    snapshot = snapshot_file(index_file)
+    catalogs = read_snapshot(snapshot, index_file, since)
+    if catalogs is not None:
+        return catalogs
+
+    catalogs = [c for c in (Catalog.from_dict(entry, store) for entry in load_index(index_file)) if c is not None]
+    try:
+        write_snapshot(snapshot, catalogs, index_file)
+    except OSError as e:
+        logger.warning(f"Could not write snapshot {snapshot}: {e}")
+    if since is not None:
+        catalogs = [c for c in catalogs if c.valid_to >= since]
+    return catalogs
+
+def write_catalogs(index_file: str, catalogs: List[Catalog], compact: bool = False):
+    """Write a store index file and its binary snapshot."""
+    digest = write_index(index_file, [c.to_dict() for c in catalogs], compact=compact)
+    write_snapshot(snapshot_file(index_file), catalogs, index_file, digest)
@@ -0,0 +1,86 @@
+import codecs
+from html.parser import HTMLParser
+import re
+from typing import Iterable, Iterator, List
+
+# Upper bound for a listing page; the stream is cut off beyond this
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+
+
+class _CatalogLinkParser(HTMLParser):
+    """Incremental parser that only looks at <a> start tags."""
+
+    def __init__(self, title_prefix: str):
+        super().__init__(convert_charrefs=True)
+        self.title_prefix = title_prefix
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        attrs = dict(attrs)
+        title = attrs.get('title') or ''
+        if title.startswith(self.title_prefix) and attrs.get('href'):
+            self.links.append(attrs['href'])
+
+
+def _iter_links_lxml(chunks: Iterable[bytes], title_prefix: str) -> Iterator[str]:
+    from lxml import etree
+
+    # 'end' events for every element, so each one can be dropped once seen and
+    # the tree never holds more than the path to the current element
+    parser = etree.HTMLPullParser(events=('end',), encoding='utf-8')
+
+    def links() -> Iterator[str]:
+        for _, element in parser.read_events():
+            if element.tag == 'a':
+                title = element.get('title') or ''
+                href = element.get('href')
+                if title.startswith(title_prefix) and href:
+                    yield href
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from links()
+    parser.close()
+    yield from links()
+
+
+def _iter_links_html_parser(chunks: Iterable[bytes], title_prefix: str) -> Iterator[str]:
+    parser = _CatalogLinkParser(title_prefix)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        if parser.links:
+            yield from parser.links
+            parser.links.clear()
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    yield from parser.links
+
+
+def iter_catalog_links(chunks: Iterable[bytes], title_prefix: str) -> Iterator[str]:
+    """
+    Yield the hrefs of links whose title starts with title_prefix from a
+    stream of HTML chunks, as soon as they are seen.
+    Uses lxml's pull parser when available, html.parser otherwise.
+    """
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return _iter_links_html_parser(chunks, title_prefix)
+    return _iter_links_lxml(chunks, title_prefix)
+
+
+def find_catalog_links(html: str, title_prefix: str) -> List[str]:
+    """Full-document fallback using BeautifulSoup."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    catalog_links = soup.find_all('a', title=re.compile('^' + re.escape(title_prefix)))
+    return [link['href'] for link in catalog_links if link.get('href')]
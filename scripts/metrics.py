@@ -0,0 +1,212 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILE = 'data/run-report.json'
+PROMETHEUS_FILE = 'data/metrics.prom'
+PROFILE_DIR = 'data/profiles'
+
+# Upper bounds (seconds) of the HTTP latency histogram buckets
+HTTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(**labels) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Histogram:
+    def __init__(self, buckets=HTTP_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total, result = 0, []
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+
+class RunMetrics:
+    """
+    Process-wide instrumentation for a crawl/render run: stage durations,
+    HTTP latency histograms, byte/status/retry counters and catalog counts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = datetime.now()
+        # (stage, labels) -> {'count', 'seconds', 'max'}
+        self.stages: Dict[Tuple[str, Labels], Dict[str, float]] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.profile_dir: Optional[str] = None
+
+    def enable_profiling(self, directory: str = PROFILE_DIR):
+        """Dump cProfile stats for every profiled stage into directory."""
+        os.makedirs(directory, exist_ok=True)
+        self.profile_dir = directory
+
+    @contextmanager
+    def stage(self, name: str, profile: bool = False, **labels) -> Iterator[None]:
+        """Time a block as one occurrence of a stage; optionally profile it."""
+        profiler = self._start_profiler(name) if profile and self.profile_dir else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                suffix = '-'.join(str(v).lower() for _, v in _labels(**labels))
+                filename = f"{name}-{suffix}.prof" if suffix else f"{name}.prof"
+                profiler.dump_stats(os.path.join(self.profile_dir, filename))
+            key = (name, _labels(**labels))
+            with self._lock:
+                entry = self.stages.setdefault(key, {'count': 0, 'seconds': 0.0, 'max': 0.0})
+                entry['count'] += 1
+                entry['seconds'] += elapsed
+                entry['max'] = max(entry['max'], elapsed)
+
+    @staticmethod
+    def _start_profiler(name: str) -> Optional[cProfile.Profile]:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Only one profiler may be active at a time on newer Pythons
+            logger.debug(f"Another profiler is active, not profiling {name}")
+            return None
+        return profiler
+
+    def timed(self, name: str, profile: bool = False):
+        """Decorator form of stage() for module-level functions."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name, profile=profile):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(**labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[(name, _labels(**labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(**labels))
+        with self._lock:
+            self.histograms.setdefault(key, Histogram()).observe(value)
+
+    def observe_http(self, method: str, host: str, status: Optional[int], seconds: float):
+        self.observe('http_request_duration_seconds', seconds, method=method, host=host)
+        self.count('http_responses_total', host=host, status=status if status is not None else 'error')
+
+    # Export
+
+    def report(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """JSON-friendly summary of the run."""
+        with self._lock:
+            report = {
+                'started_at': self.started_at.isoformat(),
+                'finished_at': datetime.now().isoformat(),
+                'stages': [
+                    dict(labels, stage=name, count=v['count'],
+                         seconds=round(v['seconds'], 6), max_seconds=round(v['max'], 6))
+                    for (name, labels), v in sorted(self.stages.items())
+                ],
+                'counters': [dict(labels, name=name, value=value) for (name, labels), value in sorted(self.counters.items())],
+                'gauges': [dict(labels, name=name, value=value) for (name, labels), value in sorted(self.gauges.items())],
+                'histograms': [
+                    dict(labels, name=name, count=h.count, sum=round(h.sum, 6), buckets=dict(h.cumulative()))
+                    for (name, labels), h in sorted(self.histograms.items())
+                ],
+            }
+        if extra:
+            report.update(extra)
+        return report
+
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format, for a node_exporter textfile collector."""
+        def fmt(labels) -> str:
+            if not labels:
+                return ''
+            pairs = ','.join(f'{k}="{v}"' for k, v in labels)
+            return '{' + pairs + '}'
+
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP akcios_stage_duration_seconds Total time spent in each stage during the last run.',
+                '# TYPE akcios_stage_duration_seconds gauge',
+            ]
+            for (name, labels), v in sorted(self.stages.items()):
+                lines.append(f"akcios_stage_duration_seconds{fmt((('stage', name),) + labels)} {v['seconds']:.6f}")
+            lines.append('# TYPE akcios_stage_calls gauge')
+            for (name, labels), v in sorted(self.stages.items()):
+                lines.append(f"akcios_stage_calls{fmt((('stage', name),) + labels)} {v['count']}")
+
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f'# TYPE akcios_{name} counter')
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f'akcios_{name}{fmt(labels)} {value:g}')
+
+            for name in sorted({n for n, _ in self.gauges}):
+                lines.append(f'# TYPE akcios_{name} gauge')
+                for (n, labels), value in sorted(self.gauges.items()):
+                    if n == name:
+                        lines.append(f'akcios_{name}{fmt(labels)} {value:g}')
+
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f'# TYPE akcios_{name} histogram')
+                for (n, labels), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    for bound, count in h.cumulative():
+                        lines.append(f'akcios_{name}_bucket{fmt(labels + (("le", bound),))} {count}')
+                    lines.append(f'akcios_{name}_sum{fmt(labels)} {h.sum:.6f}')
+                    lines.append(f'akcios_{name}_count{fmt(labels)} {h.count}')
+
+        lines.append('# TYPE akcios_last_run_timestamp_seconds gauge')
+        lines.append(f'akcios_last_run_timestamp_seconds {time.time():.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, report_file: str = REPORT_FILE, prometheus_file: str = PROMETHEUS_FILE,
+              extra: Optional[Dict[str, Any]] = None):
+        """Write the JSON run report and the Prometheus textfile."""
+        report = json.dumps(self.report(extra), indent=2, ensure_ascii=False)
+        atomic_write(report_file, report.encode('utf-8'))
+        atomic_write(prometheus_file, self.prometheus().encode('utf-8'))
+        logger.info(f"Wrote run report to {report_file} and metrics to {prometheus_file}")
+
+
+# Shared by crawlers, the HTTP client and the generator
+metrics = RunMetrics()
@@ -0,0 +1,272 @@
+import hashlib
+from html.parser import HTMLParser
+import json
+import logging
+import os
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from . import clock
+from .fileio import atomic_write
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from .base_crawler import BaseCrawler
+    from .catalog import Catalog
+    from .scheduler import Scheduler
+    from .search import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+OFFERS_DIR = 'data/offers'
+
+# Column order of a segment; every column has one value per offer
+COLUMNS = ('name', 'price', 'unit_price', 'unit', 'discount')
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """Parse Hungarian price text such as "1 299 Ft", "1.299" or "349,90"."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return None
+    text = re.sub(r'[^\d,.]', '', str(value))
+    if ',' in text:
+        # Decimal comma, dots (if any) group thousands
+        text = text.replace('.', '').replace(',', '.')
+    elif text.count('.') > 1 or re.search(r'\.\d{3}$', text):
+        text = text.replace('.', '')
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class _JsonLdParser(HTMLParser):
+    """Collects the bodies of <script type="application/ld+json"> tags."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[str] = []
+        self._in_json = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'script' and dict(attrs).get('type') == 'application/ld+json':
+            self._in_json = True
+            self.blocks.append('')
+
+    def handle_endtag(self, tag):
+        if tag == 'script':
+            self._in_json = False
+
+    def handle_data(self, data):
+        if self._in_json:
+            self.blocks[-1] += data
+
+
+def _walk(node: Any) -> Iterator[Dict[str, Any]]:
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk(item)
+    elif isinstance(node, dict):
+        yield node
+        for key in ('@graph', 'itemListElement', 'item', 'hasPart'):
+            if key in node:
+                yield from _walk(node[key])
+
+
+def _offer_from_product(product: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    offer = product.get('offers') or {}
+    if isinstance(offer, list):
+        offer = offer[0] if offer else {}
+    price = parse_price(offer.get('price', offer.get('lowPrice')))
+    name = product.get('name')
+    if not name or price is None:
+        return None
+
+    unit_price = unit = original = None
+    specifications = offer.get('priceSpecification') or []
+    if isinstance(specifications, dict):
+        specifications = [specifications]
+    for spec in specifications:
+        price_type = str(spec.get('priceType', ''))
+        if 'Strikethrough' in price_type or 'ListPrice' in price_type:
+            original = parse_price(spec.get('price'))
+        elif spec.get('referenceQuantity') or spec.get('unitText'):
+            unit_price = parse_price(spec.get('price'))
+            quantity = spec.get('referenceQuantity') or {}
+            unit = spec.get('unitText') or quantity.get('unitText') or quantity.get('unitCode')
+
+    discount = None
+    if original and original > price:
+        discount = round(100 * (1 - price / original))
+    return {'name': ' '.join(str(name).split()), 'price': price,
+            'unit_price': unit_price, 'unit': unit, 'discount': discount}
+
+
+def parse_offers(html: str) -> List[Dict[str, Any]]:
+    """
+    Product offers described by schema.org Product/Offer JSON-LD on a catalog page.
+    This is the 'jsonld' parser; a target selects its parser with the
+    ``parser`` field in targets.json ('none' for sites without structured data).
+    """
+    parser = _JsonLdParser()
+    parser.feed(html)
+    parser.close()
+    offers = []
+    for block in parser.blocks:
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        for node in _walk(data):
+            if node.get('@type') == 'Product':
+                offer = _offer_from_product(node)
+                if offer is not None:
+                    offers.append(offer)
+    return offers
+
+
+def segment_id(catalog_url: str) -> str:
+    return hashlib.sha1(catalog_url.encode('utf-8')).hexdigest()[:16]
+
+
+class OfferStore:
+    """
+    Columnar offer store: one segment file per catalog under data/offers/segments.
+
+    A segment keeps the catalog-level fields (store, validity) once and each
+    offer field as a column, so a catalog can be replaced without touching
+    the others.
+    """
+
+    def __init__(self, root: str = OFFERS_DIR):
+        self.root = root
+        self.segments_dir = os.path.join(root, 'segments')
+        self._cache: Dict[str, Dict[str, Any]] = {}
+
+    def path_for(self, segment: str) -> str:
+        return os.path.join(self.segments_dir, f'{segment}.json')
+
+    def exists(self, catalog_url: str) -> bool:
+        return os.path.exists(self.path_for(segment_id(catalog_url)))
+
+    def load(self, segment: str) -> Optional[Dict[str, Any]]:
+        if segment not in self._cache:
+            path = self.path_for(segment)
+            if not os.path.exists(path):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                self._cache[segment] = json.load(f)
+        return self._cache[segment]
+
+    def write(self, store: str, catalog: 'Catalog', offers: Sequence[Dict[str, Any]]) -> Tuple[str, bool]:
+        """Store the offers of one catalog; returns the segment id and whether it changed."""
+        segment = segment_id(catalog.url)
+        data = {
+            'catalog': catalog.url,
+            'store': store,
+            'valid_from': catalog.valid_from.isoformat(),
+            'valid_to': catalog.valid_to.isoformat(),
+            'columns': {column: [offer.get(column) for offer in offers] for column in COLUMNS},
+        }
+        if self.load(segment) == data:
+            return segment, False
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        atomic_write(self.path_for(segment), payload.encode('utf-8'))
+        self._cache[segment] = data
+        return segment, True
+
+    def row(self, segment: str, row: int) -> Dict[str, Any]:
+        data = self.load(segment)
+        offer = {column: data['columns'][column][row] for column in COLUMNS}
+        offer.update(store=data['store'], valid_from=data['valid_from'],
+                     valid_to=data['valid_to'], catalog=data['catalog'])
+        return offer
+
+
+@metrics.timed('extract_offers')
+def extract_offers(jobs: Sequence[Tuple['BaseCrawler', List['Catalog']]],
+                   scheduler: Optional['Scheduler'] = None,
+                   store: Optional[OfferStore] = None,
+                   index: Optional['SearchIndex'] = None,
+                   changed_segments: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Extract the offers of newly found catalogs into the offer store and
+    update the search index for every catalog whose offers changed.
+
+    Catalog pages are fetched on the shared scheduler as tasks of their
+    store, so its global and per-host limits hold for them too. Catalogs
+    that already have a segment and are no longer valid are not fetched
+    again. With ``changed_segments``, the ids of changed segments
+    are appended to it and the search index is left for index_segments()
+    (a shard worker leaves it to merge).
+    """
+    from .scheduler import get_scheduler
+    from .search import SearchIndex
+
+    scheduler = scheduler or get_scheduler()
+    store = store or OfferStore()
+    if changed_segments is None:
+        index = index or SearchIndex.load()
+    now = clock.now()
+    stats = {'catalogs': 0, 'changed': 0, 'offers': 0, 'failed': 0}
+
+    def extract(crawler: 'BaseCrawler', catalog: 'Catalog'):
+        return crawler, catalog, crawler.get_offers(catalog.url)
+
+    work = [(crawler, catalog) for crawler, catalogs in jobs for catalog in catalogs
+            if not (catalog.valid_to < now and store.exists(catalog.url))]
+    futures = [scheduler.submit(crawler.store_name, urlsplit(catalog.url).netloc, extract, crawler, catalog)
+               for crawler, catalog in work]
+    # Segments and the index are updated on this thread only
+    for future in futures:
+        try:
+            crawler, catalog, offers = future.result()
+        except Exception as e:
+            logger.error(f"Error extracting offers: {e}")
+            stats['failed'] += 1
+            continue
+        stats['catalogs'] += 1
+        stats['offers'] += len(offers)
+        segment, changed = store.write(crawler.store_name, catalog, offers)
+        if not changed:
+            continue
+        stats['changed'] += 1
+        if changed_segments is not None:
+            changed_segments.append(segment)
+        else:
+            index.update_segment(segment, crawler.store_name, catalog,
+                                 [offer['name'] for offer in offers])
+
+    if stats['changed'] and changed_segments is None:
+        index.save()
+    for name, value in stats.items():
+        metrics.count('offers_total', value, result=name)
+    logger.info("Offers: " + ', '.join(f"{k}={v}" for k, v in stats.items()))
+    return stats
+
+
+def index_segments(segments: Sequence[str], store: Optional[OfferStore] = None,
+                   index: Optional['SearchIndex'] = None) -> int:
+    """Update the search index from segments already in the offer store; returns how many were indexed."""
+    from .catalog import Catalog, parse_datetime
+    from .search import SearchIndex
+
+    store = store or OfferStore()
+    index = index or SearchIndex.load()
+    indexed = 0
+    for segment in segments:
+        data = store.load(segment)
+        if data is None:
+            logger.warning(f"Offer segment {segment} is missing, not indexed")
+            continue
+        catalog = Catalog(data['catalog'], parse_datetime(data['valid_from']),
+                          parse_datetime(data['valid_to']), store=data['store'])
+        index.update_segment(segment, data['store'], catalog, data['columns']['name'])
+        indexed += 1
+    if indexed:
+        index.save()
+    logger.info(f"Indexed {indexed} offer segments")
+    return indexed
@@ -0,0 +1,43 @@
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .targets import TARGETS_ENV, Target, load_targets, select
+
+# Targets are read from scripts/targets.json (or AKCIOS_TARGETS) on first use.
+# The crawl engines are only imported when crawlers are created, so
+# render-only runs never load requests or bs4.
+_targets: Optional[Dict[str, Target]] = None
+
+
+def set_targets_file(path: Optional[str]):
+    """Use another targets file for this process."""
+    global _targets
+    if path:
+        os.environ[TARGETS_ENV] = path
+    _targets = None
+
+
+def get_targets() -> Dict[str, Target]:
+    global _targets
+    if _targets is None:
+        _targets = load_targets()
+    return _targets
+
+
+def stores() -> Tuple[str, ...]:
+    """Names of all configured targets, in config order."""
+    return tuple(get_targets())
+
+
+def parse_stores(value: Optional[str]) -> List[str]:
+    """Turn 'lidl,spar' or 'lidl-*' into target names; empty means every target."""
+    if not value:
+        return list(stores())
+    return select(get_targets(), value.split(','))
+
+
+def create_crawlers(names: Sequence[str], **options) -> List:
+    from .engines import create_crawler
+
+    targets = get_targets()
+    return [create_crawler(targets[name], **options) for name in names]
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .base_crawler import BaseCrawler
+    from .catalog import Catalog
+    from .circuit import CircuitBreakers
+
+logger = logging.getLogger(__name__)
+
+# Default per-store deadline in seconds
+DEFAULT_STORE_TIMEOUT = 120.0
+
+
+class CrawlResult:
+    """Outcome of a single store crawl."""
+
+    def __init__(self, store_name: str, timeout: float):
+        self.store_name = store_name
+        self.timeout = timeout
+        self.status = 'pending'  # pending, ok, error, timeout, skipped
+        self.catalogs = 0
+        # Catalogs returned by a successful run, for later stages such as image downloads
+        self.found: List['Catalog'] = []
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'store': self.store_name,
+            'status': self.status,
+            'catalogs': self.catalogs,
+            'error': self.error,
+            'duration': round(self.duration, 3) if self.duration is not None else None,
+        }
+
+
+def _run_one(crawler: 'BaseCrawler', result: CrawlResult):
+    from .circuit import CircuitOpenError
+
+    result.started_at = time.monotonic()
+    try:
+        catalogs = crawler.run()
+        status, error = 'ok', None
+    except CircuitOpenError as e:
+        # Every request the crawler needed went to a host known to be down
+        catalogs, status, error = [], 'skipped', str(e)
+    except Exception as e:
+        catalogs, status, error = [], 'error', str(e)
+
+    # A crawler that finishes after its deadline keeps the 'timeout' status
+    with result.lock:
+        if result.status == 'pending':
+            result.catalogs = len(catalogs)
+            result.found = catalogs
+            result.status = status
+            result.error = error
+        result.finished_at = time.monotonic()
+        result.done.set()
+
+
+def run_crawlers(crawlers: List['BaseCrawler'],
+                 timeout: float = DEFAULT_STORE_TIMEOUT,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 breakers: Optional['CircuitBreakers'] = None) -> List[CrawlResult]:
+    """
+    Run all crawlers in parallel and wait until each one finished or hit its deadline.
+
+    Every crawler runs in its own daemon thread, so a store that overruns its
+    deadline is reported as timed out and does not keep the process alive.
+    Crawlers whose hosts all have an open circuit in ``breakers`` are not
+    started and reported as skipped; a timeout counts as a failure of each of
+    the store's hosts, so a retailer that hangs trips its circuit too.
+    """
+    timeouts = timeouts or {}
+    results = []
+    start = time.monotonic()
+
+    for crawler in crawlers:
+        result = CrawlResult(crawler.store_name, timeouts.get(crawler.store_name, timeout))
+        if breakers is not None and breakers.all_open(crawler.hosts):
+            result.status = 'skipped'
+            result.error = f"Circuit open for {', '.join(sorted(crawler.hosts))}"
+            logger.warning(f"Skipping {crawler.store_name}: {result.error}")
+            result.done.set()
+            results.append(result)
+            continue
+        thread = threading.Thread(
+            target=_run_one,
+            args=(crawler, result),
+            name=f"crawler-{crawler.store_name.lower()}",
+            daemon=True,
+        )
+        thread.start()
+        results.append(result)
+
+    for crawler, result in zip(crawlers, results):
+        remaining = result.timeout - (time.monotonic() - start)
+        if result.done.wait(max(remaining, 0)):
+            continue
+        with result.lock:
+            if result.status != 'pending':
+                continue
+            result.status = 'timeout'
+            result.error = f"Deadline of {result.timeout:.0f}s exceeded"
+        logger.error(f"{result.store_name} crawler timed out after {result.timeout:.0f}s")
+        if breakers is not None:
+            for host in crawler.hosts:
+                breakers.record_failure(host, f"{result.store_name} crawl timed out after {result.timeout:.0f}s")
+
+    for result in results:
+        logger.info(f"{result.store_name}: {result.status}, {result.catalogs} catalogs "
+                    f"in {result.duration or 0:.2f}s")
+
+    return results
@@ -0,0 +1,133 @@
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+import logging
+import threading
+from typing import Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 32
+DEFAULT_PER_HOST = 4
+
+
+class _Task:
+    __slots__ = ('host', 'func', 'args', 'kwargs', 'future')
+
+    def __init__(self, host: str, func: Callable, args, kwargs):
+        self.host = host
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+
+
+class Scheduler:
+    """
+    Shared worker pool for the network-bound work of every crawler.
+
+    At most ``max_workers`` tasks run at once, and at most ``per_host`` of
+    them against the same host. Each owner (a store) has its own queue, and
+    workers take from the queues round-robin, so a target with hundreds of
+    candidate URLs cannot starve the others. Within a queue, tasks start in
+    submission order unless their host is saturated.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, per_host: int = DEFAULT_PER_HOST):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self._cond = threading.Condition()
+        # owner -> pending tasks; the order is the round-robin rotation
+        self._queues: 'OrderedDict[str, Deque[_Task]]' = OrderedDict()
+        self._running: Dict[str, int] = {}
+        # Hosts with a limit other than per_host
+        self._host_limits: Dict[str, int] = {}
+        self._threads: List[threading.Thread] = []
+        self._idle = 0
+        # Queued tasks no worker has taken yet
+        self._pending = 0
+        self._closed = False
+
+    def limit_host(self, host: str, limit: int):
+        """Allow at most ``limit`` concurrent tasks against host instead of per_host."""
+        with self._cond:
+            self._host_limits[host] = max(1, limit)
+            self._cond.notify_all()
+
+    def submit(self, owner: str, host: str, func: Callable, *args, **kwargs) -> Future:
+        task = _Task(host, func, args, kwargs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Scheduler is shut down')
+            self._queues.setdefault(owner, deque()).append(task)
+            self._pending += 1
+            # Woken workers count as idle until they run, so compare with the backlog
+            if self._idle < self._pending and len(self._threads) < self.max_workers:
+                # Daemon workers, like the crawler threads: a hung request never blocks exit
+                thread = threading.Thread(target=self._work, name=f'scheduler-{len(self._threads)}', daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return task.future
+
+    def _next_task(self) -> Optional[_Task]:
+        for _ in range(len(self._queues)):
+            owner, queue = next(iter(self._queues.items()))
+            self._queues.move_to_end(owner)
+            for i, task in enumerate(queue):
+                if self._running.get(task.host, 0) < self._host_limits.get(task.host, self.per_host):
+                    del queue[i]
+                    self._pending -= 1
+                    if not queue:
+                        del self._queues[owner]
+                    return task
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    if self._closed and not self._queues:
+                        return
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                    task = self._next_task()
+                self._running[task.host] = self._running.get(task.host, 0) + 1
+
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        task.future.set_result(task.func(*task.args, **task.kwargs))
+                    except BaseException as e:
+                        task.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[task.host] -= 1
+                    # A host slot opened up: tasks waiting for it may run now
+                    self._cond.notify_all()
+
+    def shutdown(self):
+        """Let queued tasks finish, then stop the workers."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """The process-wide scheduler, created with default limits on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+
+def set_scheduler(scheduler: Optional[Scheduler]):
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
@@ -0,0 +1,252 @@
+from bisect import bisect_left
+from datetime import date
+import json
+import logging
+import os
+import re
+import unicodedata
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .fileio import atomic_write
+from .offers import OFFERS_DIR, OfferStore
+
+if TYPE_CHECKING:
+    from .catalog import Catalog
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = os.path.join(OFFERS_DIR, 'search-index.json')
+SITE_SEARCH_DIR = 'search'
+# Tokens shorter than this are not indexed; it is also the shard key length
+MIN_TOKEN_LENGTH = 2
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+Hit = Tuple[str, int]  # (segment, row)
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents: "Tejföl" and "TEJFOL" both become "tejfol"."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """Distinct folded tokens of a product name, in order of appearance."""
+    tokens = []
+    for token in _TOKEN_RE.findall(fold(text)):
+        if len(token) >= MIN_TOKEN_LENGTH and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+class SearchIndex:
+    """
+    Inverted index from folded product tokens to offer rows of the OfferStore.
+
+    Postings are grouped by segment (one per catalog), so re-extracting a
+    catalog only replaces that catalog's postings. The last query token
+    matches as a prefix, which also finds Hungarian compounds by their
+    first part ("vaj" finds "vajkrem").
+    """
+
+    def __init__(self, path: str = INDEX_FILE):
+        self.path = path
+        self.version = 0
+        # segment -> {'store', 'valid_from', 'valid_to', 'catalog', 'tokens'}
+        self.segments: Dict[str, Dict[str, Any]] = {}
+        # token -> segment -> rows
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        self._sorted_tokens: Optional[List[str]] = None
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> 'SearchIndex':
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            index.version = data['version']
+            index.segments = data['segments']
+            index.postings = data['postings']
+        return index
+
+    def save(self):
+        payload = json.dumps({'version': self.version, 'segments': self.segments, 'postings': self.postings},
+                             ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        atomic_write(self.path, payload.encode('utf-8'))
+        logger.info(f"Saved search index v{self.version}: {len(self.postings)} tokens, "
+                    f"{len(self.segments)} catalogs")
+
+    def remove_segment(self, segment: str):
+        info = self.segments.pop(segment, None)
+        if info is None:
+            return
+        for token in info['tokens']:
+            rows_by_segment = self.postings.get(token)
+            if rows_by_segment is not None:
+                rows_by_segment.pop(segment, None)
+                if not rows_by_segment:
+                    del self.postings[token]
+        self._sorted_tokens = None
+        self.version += 1
+
+    def update_segment(self, segment: str, store: str, catalog: 'Catalog', names: Sequence[str]):
+        """Replace the postings of one catalog with those of its current offer names."""
+        self.remove_segment(segment)
+        tokens: Dict[str, List[int]] = {}
+        for row, name in enumerate(names):
+            for token in tokenize(name):
+                tokens.setdefault(token, []).append(row)
+        for token, rows in tokens.items():
+            self.postings.setdefault(token, {})[segment] = rows
+        self.segments[segment] = {
+            'store': store,
+            'valid_from': catalog.valid_from.isoformat(),
+            'valid_to': catalog.valid_to.isoformat(),
+            'catalog': catalog.url,
+            'tokens': sorted(tokens),
+        }
+        self._sorted_tokens = None
+        self.version += 1
+
+    def expand(self, prefix: str) -> List[str]:
+        """Indexed tokens starting with prefix."""
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self.postings)
+        tokens = self._sorted_tokens
+        matches = []
+        for i in range(bisect_left(tokens, prefix), len(tokens)):
+            if not tokens[i].startswith(prefix):
+                break
+            matches.append(tokens[i])
+        return matches
+
+    def _hits(self, tokens: Iterable[str], segments: Set[str]) -> Set[Hit]:
+        hits = set()
+        for token in tokens:
+            for segment, rows in self.postings.get(token, {}).items():
+                if segment in segments:
+                    hits.update((segment, row) for row in rows)
+        return hits
+
+    def search(self, query: str, on: Optional[date] = None,
+               stores: Optional[Sequence[str]] = None) -> List[Hit]:
+        """
+        Offers whose names contain every query token, the last one as a prefix.
+        With ``on``, only catalogs valid that day are searched.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        segments = set(self.segments)
+        if on is not None:
+            day = on.isoformat()
+            segments = {s for s in segments
+                        if self.segments[s]['valid_from'][:10] <= day <= self.segments[s]['valid_to'][:10]}
+        if stores:
+            wanted = {store.upper() for store in stores}
+            segments = {s for s in segments if self.segments[s]['store'] in wanted}
+
+        # Rarest term first keeps the intersection small
+        term_tokens = [[t] for t in terms[:-1]] + [self.expand(terms[-1])]
+        term_tokens.sort(key=lambda tokens: sum(len(self.postings.get(t, ())) for t in tokens))
+        hits: Optional[Set[Hit]] = None
+        for tokens in term_tokens:
+            matched = self._hits(tokens, segments if hits is None else {s for s, _ in hits})
+            hits = matched if hits is None else hits & matched
+            if not hits:
+                return []
+        return sorted(hits)
+
+
+def find_offers(query: str, on: Optional[date] = None, stores: Optional[Sequence[str]] = None,
+                limit: int = 50, index: Optional[SearchIndex] = None,
+                store: Optional[OfferStore] = None) -> List[Dict[str, Any]]:
+    """Matching offers across stores, cheapest unit price (or price) first."""
+    index = index or SearchIndex.load()
+    store = store or OfferStore()
+    offers = [store.row(segment, row) for segment, row in index.search(query, on, stores)]
+    offers.sort(key=lambda o: (o['unit_price'] if o['unit_price'] is not None else o['price'], o['name']))
+    return offers[:limit]
+
+
+def _write_if_changed(path: str, data: Any) -> bool:
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == payload:
+                return False
+    atomic_write(path, payload)
+    return True
+
+
+def _remove_site_index(directory: str):
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            os.remove(os.path.join(directory, name))
+
+
+def write_site_index(since: date, directory: str = SITE_SEARCH_DIR,
+                     index: Optional[SearchIndex] = None,
+                     store: Optional[OfferStore] = None) -> Optional[str]:
+    """
+    Prebuilt search index for the static site, covering catalogs valid on or after ``since``.
+
+    offers.json holds the offers as columns; postings are split into shards
+    by the first two letters of each token (t-<xx>.json), so the page only
+    downloads the shards its query needs. meta.json lists the shards. Files
+    are only rewritten when their content changes. Returns the meta.json
+    path, or None when no offers are in range; then the files of an earlier
+    build are removed, so the page shows no search form.
+    """
+    index = index or SearchIndex.load()
+    store = store or OfferStore()
+    day = since.isoformat()
+    segments = sorted(s for s, info in index.segments.items() if info['valid_to'][:10] >= day)
+
+    columns: Dict[str, List[Any]] = {'name': [], 'price': [], 'unit_price': [], 'unit': [],
+                                     'discount': [], 'catalog': []}
+    catalogs = []
+    position: Dict[Hit, int] = {}
+    for catalog_id, segment in enumerate(segments):
+        info = index.segments[segment]
+        catalogs.append([info['store'], info['valid_from'][:10], info['valid_to'][:10], info['catalog']])
+        data = store.load(segment)
+        if data is None:
+            continue
+        for row in range(len(data['columns']['name'])):
+            position[(segment, row)] = len(columns['catalog'])
+            for column in ('name', 'price', 'unit_price', 'unit', 'discount'):
+                columns[column].append(data['columns'][column][row])
+            columns['catalog'].append(catalog_id)
+
+    shards: Dict[str, Dict[str, List[int]]] = {}
+    wanted = set(segments)
+    for token, rows_by_segment in index.postings.items():
+        offsets = [position[(segment, row)] for segment, rows in rows_by_segment.items()
+                   if segment in wanted for row in rows if (segment, row) in position]
+        if offsets:
+            shards.setdefault(token[:MIN_TOKEN_LENGTH], {})[token] = sorted(offsets)
+
+    if not columns['name']:
+        _remove_site_index(directory)
+        logger.info("Search index: no offers in range, search disabled")
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    written = int(_write_if_changed(os.path.join(directory, 'offers.json'),
+                                    {'catalogs': catalogs, 'columns': columns}))
+    for key, postings in shards.items():
+        written += _write_if_changed(os.path.join(directory, f't-{key}.json'), postings)
+    for name in os.listdir(directory):
+        if name.startswith('t-') and name.endswith('.json') and name[2:-5] not in shards:
+            os.remove(os.path.join(directory, name))
+
+    meta_path = os.path.join(directory, 'meta.json')
+    written += _write_if_changed(meta_path, {'offers': len(columns['name']), 'shards': sorted(shards),
+                                             'min_token_length': MIN_TOKEN_LENGTH})
+    logger.info(f"Search index: {len(columns['name'])} offers in {len(shards)} shards, {written} files written")
+    return meta_path
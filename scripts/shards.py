@@ -0,0 +1,215 @@
+"""
+Crawling the stores in shards, in separate processes or on separate machines.
+
+``python -m scripts crawl --shard 2/4`` crawls every fourth selected store,
+starting with the second, and writes only files no other shard writes:
+
+    data/index-<store>.json       for the shard's own stores
+    data/offers/segments/*.json   one per catalog
+    data/images/<hash>/...        content-addressed
+    data/shards/2-of-4/           manifest.json, the shard's image index,
+                                  run report, metrics and circuit breakers
+
+The manifest is written last and lists the sha256 of every index file, so
+its presence means the shard finished and its outputs can be checked.
+``python -m scripts merge`` validates all manifests, folds the shard-level
+state (search index, image index, SQLite storage) into the shared files and
+renders once. Shards can finish in any order; only merge touches shared files.
+After a successful merge the manifests are renamed to merged.json, so the
+next merge only sees shards crawled since.
+"""
+from datetime import datetime
+import glob
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from .build_manifest import file_hash
+from .fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+SHARDS_DIR = 'data/shards'
+MANIFEST_FILE = 'manifest.json'
+MERGED_FILE = 'merged.json'
+IMAGES_INDEX_FILE = 'images-index.json'
+MANIFEST_SCHEMA = 1
+# Ties the manifests of one CI run together, so stale shards are not merged
+RUN_ID_ENV = 'GITHUB_RUN_ID'
+
+
+def default_run_id() -> str:
+    """$GITHUB_RUN_ID, or for local runs the day, shared by shards started that day."""
+    return os.environ.get(RUN_ID_ENV) or f"local-{datetime.now():%Y%m%d}"
+
+
+class ShardError(ValueError):
+    """Shard manifests that cannot be merged."""
+
+
+class Shard:
+    """Shard ``index`` (1-based) of ``count``."""
+
+    def __init__(self, index: int, count: int):
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"Invalid shard {index}/{count}: expected 1 <= i <= n")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, value: str) -> 'Shard':
+        """'2/4' -> Shard(2, 4)."""
+        try:
+            index, count = (int(part) for part in value.split('/'))
+        except ValueError:
+            raise ValueError(f"Invalid shard {value!r}: expected i/n, e.g. 2/4") from None
+        return cls(index, count)
+
+    @property
+    def name(self) -> str:
+        return f'{self.index}-of-{self.count}'
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(SHARDS_DIR, self.name)
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def assign(self, stores: Sequence[str]) -> List[str]:
+        """This shard's stores: every count-th of ``stores``, so shards get equal numbers."""
+        return [store for position, store in enumerate(stores) if position % self.count == self.index - 1]
+
+    def __repr__(self):
+        return f'{self.index}/{self.count}'
+
+
+def index_file(store: str) -> str:
+    return f'data/index-{store.lower()}.json'
+
+
+def clear_manifest(shard: Shard):
+    """Drop the shard's manifest from an earlier run before crawling, so it is never merged stale."""
+    if os.path.exists(shard.path(MANIFEST_FILE)):
+        os.remove(shard.path(MANIFEST_FILE))
+
+
+def write_manifest(shard: Shard, selected: Sequence[str], results: Sequence[Any],
+                   segments: Sequence[str], run_id: Optional[str] = None):
+    """Record what a finished shard wrote; called after all of its other outputs."""
+    assigned = shard.assign(selected)
+    manifest = {
+        'schema': MANIFEST_SCHEMA,
+        'run_id': run_id,
+        'shard': shard.index,
+        'count': shard.count,
+        'selected': list(selected),
+        'stores': assigned,
+        'files': {index_file(store): file_hash(index_file(store)) for store in assigned},
+        'segments': sorted(set(segments)),
+        'crawlers': [result.to_dict() for result in results],
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    atomic_write(shard.path(MANIFEST_FILE), json.dumps(manifest, indent=2).encode('utf-8'))
+    logger.info(f"Shard {shard}: wrote {shard.path(MANIFEST_FILE)} for {', '.join(assigned) or 'no stores'}")
+
+
+def load_manifests(directory: str = SHARDS_DIR) -> List[Dict[str, Any]]:
+    manifests = []
+    for path in sorted(glob.glob(os.path.join(directory, '*', MANIFEST_FILE))):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            raise ShardError(f"Unreadable shard manifest {path}: {e}") from None
+        manifest['path'] = path
+        manifests.append(manifest)
+    return manifests
+
+
+def validate(manifests: Sequence[Dict[str, Any]], run_id: Optional[str] = None,
+             allow_missing: bool = False) -> List[Dict[str, Any]]:
+    """
+    Check that the manifests are shards of one run that fit together and
+    that every index file is still the one its shard wrote. Without
+    ``run_id``, the run of the most recently finished shard is merged.
+    Returns the manifests ordered by shard; raises ShardError otherwise.
+    """
+    if not manifests:
+        raise ShardError(f"No shard manifests found in {SHARDS_DIR}")
+    for manifest in manifests:
+        if manifest.get('schema') != MANIFEST_SCHEMA:
+            raise ShardError(f"{manifest['path']} has schema {manifest.get('schema')}, expected {MANIFEST_SCHEMA}")
+
+    if run_id is None:
+        run_id = max(manifests, key=lambda m: m['finished_at'])['run_id']
+    others = [m['path'] for m in manifests if m.get('run_id') != run_id]
+    manifests = [m for m in manifests if m.get('run_id') == run_id]
+    if not manifests:
+        raise ShardError(f"No shard manifests for run {run_id}")
+    if others:
+        logger.warning(f"Ignoring manifests of other runs: {', '.join(others)}")
+    for field in ('count', 'selected'):
+        values = {json.dumps(m.get(field)) for m in manifests}
+        if len(values) > 1:
+            raise ShardError(f"Shard manifests disagree on {field}: {', '.join(sorted(values))}")
+
+    count = manifests[0]['count']
+    selected = manifests[0]['selected']
+    by_index: Dict[int, Dict[str, Any]] = {}
+    for manifest in manifests:
+        index = manifest['shard']
+        if index in by_index:
+            raise ShardError(f"Shard {index}/{count} appears twice: {by_index[index]['path']}, {manifest['path']}")
+        shard = Shard(index, count)
+        if manifest['stores'] != shard.assign(selected):
+            raise ShardError(f"Shard {shard} crawled {manifest['stores']}, expected {shard.assign(selected)}")
+        for path, digest in manifest['files'].items():
+            if file_hash(path) != digest:
+                raise ShardError(f"{path} does not match the manifest of shard {shard}")
+        by_index[index] = manifest
+
+    missing = sorted(set(range(1, count + 1)) - set(by_index))
+    if missing:
+        message = f"Missing shards: {', '.join(f'{index}/{count}' for index in missing)}"
+        if not allow_missing:
+            raise ShardError(message)
+        logger.warning(f"{message}; merging the others")
+    return [by_index[index] for index in sorted(by_index)]
+
+
+def archive_manifests(manifests: Sequence[Dict[str, Any]]):
+    """Rename merged manifests to merged.json; they stay for reference but are not merged again."""
+    for manifest in manifests:
+        os.replace(manifest['path'], os.path.join(os.path.dirname(manifest['path']), MERGED_FILE))
+
+
+def merge_images_index(manifests: Sequence[Dict[str, Any]]):
+    """Fold the image indexes the shards wrote into data/images/index.json."""
+    from .images import ImageStore
+
+    paths = [os.path.join(os.path.dirname(m['path']), IMAGES_INDEX_FILE) for m in manifests]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return
+    store = ImageStore()
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        store.images.update(data.get('images', {}))
+        store.catalogs.update(data.get('catalogs', {}))
+    store.save()
+    logger.info(f"Merged {len(paths)} shard image indexes")
+
+
+def import_storage(manifests: Sequence[Dict[str, Any]]):
+    """With SQLite storage, load the shards' index files into the database."""
+    from .catalog_db import CatalogDB, get_storage
+
+    if get_storage() != 'sqlite':
+        return
+    db = CatalogDB()
+    for manifest in manifests:
+        for store in manifest['stores']:
+            db.import_json(store, index_file(store))
@@ -0,0 +1,181 @@
+"""
+Binary snapshot of a catalog list.
+
+Layout (little-endian):
+    header   magic b'AKCS', version u16, count u32, then the sha256, size and
+             mtime (ns) of the index file the snapshot was built from
+    stores   u16 count, then u16 length + UTF-8 bytes per store name
+    columns  store index u16[n]; valid_from, valid_to, last_updated i64[n]
+             (microseconds since 1970-01-01, MISSING for no value);
+             URL offsets u32[n + 1] into the UTF-8 URL blob that ends the file
+
+Each column is read with a single array.frombytes call, so loading is O(n)
+with no per-field parsing. Equal timestamps share one datetime object, which
+matters because every catalog of a week has the same dates.
+
+A snapshot is current while the index file's size and mtime match; after a
+checkout changes the mtime, the content hash decides.
+"""
+from array import array
+from datetime import datetime, timedelta
+import logging
+import os
+import struct
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .build_manifest import file_hash
+from .catalog import Catalog
+from .fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'AKCS'
+VERSION = 1
+HEADER = struct.Struct('<4sHI32sQq')
+EPOCH = datetime(1970, 1, 1)
+MISSING = -2 ** 63
+
+_SWAP = sys.byteorder != 'little'
+
+# (sha256 hex, size, mtime_ns) of the source index file
+Source = Tuple[str, int, int]
+
+
+def source_info(path: str, digest: Optional[str] = None) -> Source:
+    stat = os.stat(path)
+    return digest or file_hash(path), stat.st_size, stat.st_mtime_ns
+
+
+def _micros(value: Optional[datetime]) -> int:
+    if value is None:
+        return MISSING
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _column(typecode: str, values) -> bytes:
+    column = array(typecode, values)
+    if _SWAP:
+        column.byteswap()
+    return column.tobytes()
+
+
+def pack(catalogs: Sequence[Catalog], source: Source = ('', 0, 0)) -> bytes:
+    stores = sorted({c.store or '' for c in catalogs})
+    store_ids = {store: i for i, store in enumerate(stores)}
+
+    digest, size, mtime_ns = source
+    parts = [HEADER.pack(MAGIC, VERSION, len(catalogs), bytes.fromhex(digest) if digest else b'', size, mtime_ns)]
+    parts.append(struct.pack('<H', len(stores)))
+    for store in stores:
+        encoded = store.encode('utf-8')
+        parts.append(struct.pack('<H', len(encoded)) + encoded)
+
+    offsets, position = [0], 0
+    for catalog in catalogs:
+        position += len(catalog.url)
+        offsets.append(position)
+
+    parts.append(_column('H', (store_ids[c.store or ''] for c in catalogs)))
+    parts.append(_column('q', (_micros(c.valid_from) for c in catalogs)))
+    parts.append(_column('q', (_micros(c.valid_to) for c in catalogs)))
+    parts.append(_column('q', (_micros(c.last_updated) for c in catalogs)))
+    parts.append(_column('I', offsets))
+    # Offsets count characters, so the blob is decoded once and sliced
+    parts.append(''.join(c.url for c in catalogs).encode('utf-8'))
+    return b''.join(parts)
+
+
+def is_current(data: bytes, source_file: str) -> bool:
+    """Whether a snapshot was built from the current content of source_file."""
+    if len(data) < HEADER.size:
+        return False
+    magic, version, _, digest, size, mtime_ns = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        return False
+    stat = os.stat(source_file)
+    if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+        return True
+    return stat.st_size == size and file_hash(source_file) == digest.hex()
+
+
+def unpack(data: bytes, since: Optional[datetime] = None) -> List[Catalog]:
+    """Catalogs from a snapshot; with ``since``, only those still valid then."""
+    magic, version, count = HEADER.unpack_from(data)[:3]
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} catalog snapshot")
+
+    view = memoryview(data)
+    position = HEADER.size
+    (store_count,) = struct.unpack_from('<H', data, position)
+    position += 2
+    stores = []
+    for _ in range(store_count):
+        (length,) = struct.unpack_from('<H', data, position)
+        position += 2
+        stores.append(bytes(view[position:position + length]).decode('utf-8') or None)
+        position += length
+
+    def column(typecode: str, length: int) -> array:
+        nonlocal position
+        values = array(typecode)
+        size = values.itemsize * length
+        values.frombytes(view[position:position + size])
+        if _SWAP:
+            values.byteswap()
+        position += size
+        return values
+
+    store_ids = column('H', count)
+    valid_from = column('q', count)
+    valid_to = column('q', count)
+    last_updated = column('q', count)
+    offsets = column('I', count + 1)
+    urls = bytes(view[position:]).decode('utf-8')
+    rows = range(count)
+    if since is not None:
+        # Filtered on the raw column, so catalogs outside the window are never built
+        start = _micros(since)
+        rows = [i for i, value in enumerate(valid_to) if value >= start]
+        store_ids, valid_from, valid_to, last_updated = (
+            [values[i] for i in rows] for values in (store_ids, valid_from, valid_to, last_updated))
+
+    # One datetime per distinct timestamp; the column lookups below then run in C
+    datetimes: Dict[int, Optional[datetime]] = {
+        value: EPOCH + timedelta(microseconds=value)
+        for value in set(valid_from).union(valid_to, last_updated) if value != MISSING
+    }
+    datetimes[MISSING] = None
+    lookup = datetimes.__getitem__
+    return list(map(
+        Catalog,
+        [urls[offsets[i]:offsets[i + 1]] for i in rows],
+        map(lookup, valid_from),
+        map(lookup, valid_to),
+        map(lookup, last_updated),
+        map(stores.__getitem__, store_ids),
+    ))
+
+
+def write_snapshot(path: str, catalogs: Sequence[Catalog], source_file: str, digest: Optional[str] = None):
+    """Write the snapshot of source_file's catalogs; pass digest if its hash is already known."""
+    atomic_write(path, pack(catalogs, source_info(source_file, digest)))
+
+
+def read_snapshot(path: str, source_file: str, since: Optional[datetime] = None) -> Optional[List[Catalog]]:
+    """
+    Load a snapshot file, optionally only catalogs still valid at ``since``;
+    None if it is missing, corrupt or older than source_file.
+    """
+    if not os.path.exists(path) or not os.path.exists(source_file):
+        return None
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        if not is_current(data, source_file):
+            return None
+        return unpack(data, since)
+    except (struct.error, ValueError, IndexError, UnicodeDecodeError) as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
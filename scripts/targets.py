@@ -0,0 +1,153 @@
+from fnmatch import fnmatchcase
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+# Crawl targets are data, not classes: scripts/targets.json describes every
+# store site, and scripts.engines turns each entry into a BaseCrawler.
+DEFAULT_TARGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'targets.json')
+TARGETS_ENV = 'AKCIOS_TARGETS'
+
+ENGINE_NAMES = ('templates', 'link_listing')
+# Used when neither the target nor the file's "defaults" set a field
+BUILTIN_DEFAULTS = {'engine': 'templates', 'validation': 'head', 'parser': 'jsonld'}
+VALIDATIONS = ('head', 'get', 'none')
+PARSERS = ('jsonld', 'none')
+
+# Field -> (type, required by engine)
+FIELDS: Dict[str, tuple] = {
+    'name': (str, None),
+    'retailer': (str, None),
+    'country': (str, None),
+    'engine': (str, None),
+    'notes': (str, None),
+    'week_offsets': (list, None),
+    'publish_weekdays': (list, None),
+    'validity_days': (int, None),
+    'valid_to_end_of_day': (bool, None),
+    'validation': (str, None),
+    'follow_redirects': (bool, None),
+    'parser': (str, None),
+    'probe_per_host': (int, None),
+    # templates engine
+    'templates': (list, 'templates'),
+    'variants': (dict, None),
+    # link_listing engine
+    'listing_url': (str, 'link_listing'),
+    'link_title_prefix': (str, 'link_listing'),
+    'date_pattern': (str, 'link_listing'),
+}
+
+
+class Target:
+    """One crawl target: a store site in one country, as described in targets.json."""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.name: str = config['name']
+        self.engine: str = config['engine']
+
+    def get(self, field: str, default: Any = None) -> Any:
+        return self.config.get(field, default)
+
+    def __repr__(self):
+        return f"Target({self.name!r}, engine={self.engine!r})"
+
+
+def _expand(entry: Dict[str, Any], source: str) -> List[Dict[str, Any]]:
+    """
+    Expand an entry with ``instances`` into one target per instance.
+
+    Instance keys that are target fields (e.g. country, publish_weekdays)
+    override them for that instance. Other keys must be strings or integers
+    and are added as single-valued variants, so URL templates can use them.
+    String and integer values of both kinds fill ``{key}`` placeholders in
+    the name and listing URL:
+
+        {"name": "LIDL-{country}", "templates": ["https://www.lidl.{tld}/..."],
+         "instances": [{"country": "sk", "tld": "sk"}, {"country": "cz", "tld": "cz"}]}
+    """
+    instances = entry.pop('instances', None)
+    if not instances:
+        return [entry]
+    expanded = []
+    for instance in instances:
+        variants = {k: v for k, v in instance.items() if k not in FIELDS}
+        for key, value in variants.items():
+            if not isinstance(value, (str, int)) or isinstance(value, bool):
+                raise ValueError(f"{source}: target {entry.get('name')!r}: instance value {key!r} "
+                                 f"must be a string or integer, got {type(value).__name__}")
+        placeholders = {k: v for k, v in instance.items()
+                        if isinstance(v, (str, int)) and not isinstance(v, bool)}
+        config = dict(entry)
+        config['name'] = entry['name'].format(**placeholders)
+        if 'listing_url' in entry:
+            config['listing_url'] = entry['listing_url'].format(**placeholders)
+        config['variants'] = dict(entry.get('variants', {}), **{k: [v] for k, v in variants.items()})
+        config.update({k: v for k, v in instance.items() if k in FIELDS and k != 'name'})
+        expanded.append(config)
+    return expanded
+
+
+def _validate(config: Dict[str, Any], source: str):
+    name = config.get('name')
+    where = f"{source}: target {name!r}"
+    if not name:
+        raise ValueError(f"{source}: every target needs a name")
+    for field, value in config.items():
+        if field not in FIELDS:
+            raise ValueError(f"{where}: unknown field {field!r}")
+        expected = FIELDS[field][0]
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise ValueError(f"{where}: {field} must be {expected.__name__}")
+    for field in ('publish_weekdays', 'week_offsets'):
+        if field in config and not config[field]:
+            raise ValueError(f"{where}: {field} must not be empty")
+    if not all(isinstance(day, int) and 0 <= day <= 6 for day in config.get('publish_weekdays', [0])):
+        raise ValueError(f"{where}: publish_weekdays must be weekday numbers 0-6 (0 = Monday)")
+    if config['engine'] not in ENGINE_NAMES:
+        raise ValueError(f"{where}: unknown engine {config['engine']!r} (known: {', '.join(ENGINE_NAMES)})")
+    for field, (_, engine) in FIELDS.items():
+        if engine == config['engine'] and not config.get(field):
+            raise ValueError(f"{where}: the {engine} engine needs {field}")
+    if config['validation'] not in VALIDATIONS:
+        raise ValueError(f"{where}: validation must be one of {', '.join(VALIDATIONS)}")
+    if config['parser'] not in PARSERS:
+        raise ValueError(f"{where}: parser must be one of {', '.join(PARSERS)}")
+    if config['engine'] == 'link_listing':
+        groups = re.compile(config['date_pattern']).groupindex
+        if not {'year', 'month', 'day'} <= set(groups):
+            raise ValueError(f"{where}: date_pattern needs year, month and day groups")
+
+
+def load_targets(path: Optional[str] = None) -> Dict[str, Target]:
+    """Targets by upper-case name, in file order. Raises ValueError on invalid config."""
+    path = path or os.environ.get(TARGETS_ENV) or DEFAULT_TARGETS_FILE
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    defaults = data.get('defaults', {})
+    targets: Dict[str, Target] = {}
+    for entry in data.get('targets', []):
+        for config in _expand({**BUILTIN_DEFAULTS, **defaults, **entry}, path):
+            _validate(config, path)
+            config['name'] = config['name'].upper()
+            if config['name'] in targets:
+                raise ValueError(f"{path}: duplicate target {config['name']!r}")
+            targets[config['name']] = Target(config)
+    return targets
+
+
+def select(targets: Dict[str, Target], patterns: Sequence[str]) -> List[str]:
+    """Target names matching any of the (case-insensitive, glob) patterns, in config order."""
+    selected = []
+    for pattern in patterns:
+        pattern = pattern.strip().upper()
+        if not pattern:
+            continue
+        matches = [name for name in targets if fnmatchcase(name, pattern)]
+        if not matches:
+            raise ValueError(f"Unknown store: {pattern} (known: {', '.join(targets)})")
+        selected += [name for name in matches if name not in selected]
+    return selected
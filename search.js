@@ -0,0 +1,88 @@
+// Offer search over the prebuilt index written by scripts/search.py.
+// Only the token shards a query needs are downloaded.
+(function () {
+    var form = document.querySelector('form.search');
+    if (!form) return;
+    var results = document.querySelector('.search-results');
+    var base = form.getAttribute('data-index').replace(/meta\.json$/, '');
+    var meta, offers, shards = {};
+
+    function getJSON(url) {
+        return fetch(url).then(function (r) { return r.ok ? r.json() : {}; });
+    }
+
+    function fold(text) {
+        return text.toLowerCase().normalize('NFKD').replace(/[\u0300-\u036f]/g, '');
+    }
+
+    function tokens(text) {
+        return (fold(text).match(/[a-z0-9]+/g) || []).filter(function (t) {
+            return t.length >= meta.min_token_length;
+        });
+    }
+
+    function shard(key) {
+        if (meta.shards.indexOf(key) < 0) return Promise.resolve({});
+        if (!shards[key]) shards[key] = getJSON(base + 't-' + key + '.json');
+        return shards[key];
+    }
+
+    // Offers matching one token; the last query token matches as a prefix
+    function matches(token, prefix) {
+        return shard(token.slice(0, meta.min_token_length)).then(function (postings) {
+            var found = {};
+            Object.keys(postings).forEach(function (key) {
+                if (key === token || (prefix && key.indexOf(token) === 0)) {
+                    postings[key].forEach(function (i) { found[i] = true; });
+                }
+            });
+            return found;
+        });
+    }
+
+    function render(ids) {
+        var c = offers.columns;
+        ids.sort(function (a, b) {
+            return (c.unit_price[a] || c.price[a]) - (c.unit_price[b] || c.price[b]);
+        });
+        results.innerHTML = '';
+        ids.slice(0, 50).forEach(function (i) {
+            var catalog = offers.catalogs[c.catalog[i]];
+            var row = document.createElement('a');
+            row.className = 'search-result';
+            row.href = catalog[3];
+            row.target = '_blank';
+            var price = c.price[i] + ' Ft';
+            if (c.unit_price[i] != null) price += ' (' + c.unit_price[i] + ' Ft/' + (c.unit[i] || 'unit') + ')';
+            if (c.discount[i]) price += ' -' + c.discount[i] + '%';
+            row.textContent = catalog[0] + ' · ' + c.name[i] + ' · ' + price;
+            results.appendChild(row);
+        });
+    }
+
+    function search(query) {
+        var terms = tokens(query);
+        if (!terms.length) { results.innerHTML = ''; return; }
+        Promise.all(terms.map(function (t, i) { return matches(t, i === terms.length - 1); }))
+            .then(function (sets) {
+                var ids = Object.keys(sets[0]).filter(function (i) {
+                    return sets.every(function (s) { return s[i]; });
+                }).map(Number);
+                offers = offers || getJSON(base + 'offers.json');
+                return Promise.resolve(offers).then(function (data) { offers = data; render(ids); });
+            });
+    }
+
+    var timer;
+    form.addEventListener('submit', function (e) { e.preventDefault(); });
+    form.q.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            var query = form.q.value;
+            (meta ? Promise.resolve(meta) : getJSON(base + 'meta.json')).then(function (m) {
+                meta = m;
+                search(query);
+            });
+        }, 150);
+    });
+})();